@@ -0,0 +1,199 @@
+"""
+Cold-history archival: closed years move from transactions to archived_transactions
+Keeps the hot table (and its indexes) sized to recent activity. Each moved row is also
+rolled up into archive_summaries, which analytics reads instead of the archive itself.
+Readers union in the archive only when a requested range reaches user.archived_through.
+Run this file periodically (e.g. yearly from cron) to archive every user.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+import argparse
+import sys
+import time
+
+from sqlalchemy import and_, delete, func, insert, text, update
+from sqlalchemy.orm import Session
+
+from models import User, Transaction, ArchivedTransaction, ArchiveSummary
+from budgets import month_start
+from config import ARCHIVE_HOT_YEARS
+
+BATCH_SIZE = 1000
+
+ARCHIVED_COLUMNS = [
+    "id", "username", "date", "category", "category_id", "amount", "currency",
+    "description", "kind", "recurring_rule_id", "change_seq", "fingerprint"
+]
+
+def archive_cutoff(today: Optional[date] = None, hot_years: int = ARCHIVE_HOT_YEARS) -> date:
+    """First day that stays hot: January 1st of the oldest year kept in the hot table"""
+    today = today or date.today()
+    return date(today.year - hot_years + 1, 1, 1)
+
+def reaches_archive(user: User, start_date: Optional[date]) -> bool:
+    """Whether a range starting at start_date (None = all history) needs the archive"""
+    return user.archived_through is not None and (start_date is None or start_date <= user.archived_through)
+
+def history_models(user: User, start_date: Optional[date] = None) -> List[type]:
+    """Tables to read for a range: the hot table, plus the archive only when the range reaches it"""
+    return [Transaction, ArchivedTransaction] if reaches_archive(user, start_date) else [Transaction]
+
+def live_rows(db: Session, model, *columns):
+    """Query non-deleted rows of either table (archived rows are never tombstoned)"""
+    query = db.query(*[getattr(model, c) for c in columns])
+    if model is Transaction:
+        query = query.filter(Transaction.deleted_at.is_(None))
+    return query
+
+# ---------------------- SUMMARIES ---------------------- #
+def _add_to_summaries(db: Session, username: str, rows: List[dict]):
+    """Fold a batch of archived rows into the per-month summaries (one executemany each way)"""
+    deltas = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        key = (month_start(row["date"]), row["category_id"], row["kind"], row["currency"])
+        deltas[key][0] += row["amount"]
+        deltas[key][1] += 1
+
+    existing = {
+        (s.month, s.category_id, s.kind, s.currency): (s.id, s.total, s.count)
+        for s in db.query(
+            ArchiveSummary.id, ArchiveSummary.month, ArchiveSummary.category_id,
+            ArchiveSummary.kind, ArchiveSummary.currency, ArchiveSummary.total, ArchiveSummary.count
+        ).filter(
+            and_(
+                ArchiveSummary.username == username,
+                ArchiveSummary.month.in_({month for month, _, _, _ in deltas})
+            )
+        ).with_for_update()
+    }
+
+    updates, inserts = [], []
+    for (month, category_id, kind, currency), (total, count) in deltas.items():
+        key = (month, category_id, kind, currency)
+        if key in existing:
+            summary_id, old_total, old_count = existing[key]
+            updates.append({"id": summary_id, "total": old_total + total, "count": old_count + count})
+        else:
+            inserts.append({
+                "username": username,
+                "month": month,
+                "category_id": category_id,
+                "kind": kind,
+                "currency": currency,
+                "total": total,
+                "count": count
+            })
+    if updates:
+        db.execute(update(ArchiveSummary), updates)
+    if inserts:
+        db.execute(insert(ArchiveSummary), inserts)
+
+# ---------------------- ARCHIVAL ---------------------- #
+def archive_user(db: Session, user: User, cutoff: date, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Move the user's live transactions dated before cutoff into the archive.
+    Each batch copies rows (ids preserved), updates the summaries and deletes the hot rows
+    in one transaction, so an interrupted run leaves no row in both tables.
+    Tombstoned rows stay hot until the undo purge removes them.
+    Returns the number of transactions archived.
+    """
+    username, through = user.username, cutoff - timedelta(days=1)
+    if user.archived_through and user.archived_through > through:
+        # A run with a later cutoff already archived further; never move the horizon back
+        through = user.archived_through
+
+    moved = 0
+    while True:
+        batch = db.query(Transaction).filter(
+            and_(
+                Transaction.username == username,
+                Transaction.deleted_at.is_(None),
+                Transaction.date < cutoff
+            )
+        ).order_by(Transaction.id).limit(batch_size).with_for_update().all()
+        if not batch:
+            break
+
+        rows = [{column: getattr(t, column) for column in ARCHIVED_COLUMNS} for t in batch]
+        db.execute(insert(ArchivedTransaction), rows)
+        _add_to_summaries(db, username, rows)
+        db.execute(delete(Transaction).where(Transaction.id.in_([t.id for t in batch])))
+        for t in batch:
+            db.expunge(t)
+        db.execute(
+            update(User)
+            .where(User.username == username)
+            .values(archived_through=through)
+        )
+        db.commit()
+        reserve_archived_ids(db)
+        moved += len(rows)
+    return moved
+
+def reserve_archived_ids(db: Session):
+    """
+    Keep the hot table's next id above every archived id, so a transaction inserted after
+    archival (e.g. back-dated) never reuses the id of an archived one. MySQL 5.7 resets
+    AUTO_INCREMENT to MAX(id) + 1 of the hot table on restart, so this also runs at startup.
+    SQLite never reuses ids because transactions is created with AUTOINCREMENT.
+    """
+    if db.bind.dialect.name != "mysql":
+        return
+    top = db.query(func.max(ArchivedTransaction.id)).scalar()
+    if not top:
+        return
+    current = db.execute(text(
+        "SELECT AUTO_INCREMENT FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+    ), {"table": Transaction.__tablename__}).scalar()
+    # Only ever raise it: a lower value would let InnoDB hand out ids of purged rows again
+    if current is None or current <= top:
+        db.execute(text(f"ALTER TABLE {Transaction.__tablename__} AUTO_INCREMENT = {int(top) + 1}"))
+    db.commit()
+
+def archive_closed_years(db: Session, username: Optional[str] = None, today: Optional[date] = None,
+                         hot_years: int = ARCHIVE_HOT_YEARS) -> Tuple[int, int]:
+    """Archive every user (or one user). Returns (users archived, transactions moved)"""
+    cutoff = archive_cutoff(today, hot_years)
+    candidates = db.query(Transaction.username).filter(
+        and_(
+            Transaction.deleted_at.is_(None),
+            Transaction.date < cutoff
+        )
+    )
+    if username:
+        candidates = candidates.filter(Transaction.username == username)
+    usernames = [u for (u,) in candidates.distinct().all()]
+
+    users, moved = 0, 0
+    for name in usernames:
+        user = db.query(User).filter(User.username == name).first()
+        if not user:
+            continue
+        count = archive_user(db, user, cutoff)
+        if count:
+            users += 1
+            moved += count
+    return users, moved
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Move closed years of transactions to the archive")
+    parser.add_argument("--username", help="archive a single user")
+    parser.add_argument("--hot-years", type=int, default=ARCHIVE_HOT_YEARS,
+                        help="years kept in the hot table, counting the current one")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        began = time.perf_counter()
+        users, moved = archive_closed_years(db, args.username, hot_years=args.hot_years)
+        print(f"✅ Archived {moved} transaction(s) for {users} user(s) before "
+              f"{archive_cutoff(hot_years=args.hot_years).isoformat()} in {time.perf_counter() - began:.2f}s")
+    except Exception as e:
+        print(f"❌ Error archiving transactions: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
@@ -0,0 +1,167 @@
+"""
+Running balance index: persisted per-day and per-month net amounts
+Each write adds its signed amount to one (username, date) row and one (username, month)
+row, so the balance on any date is the sum of the whole months before it plus at most
+31 days of its own month, instead of a sum over every active day or transaction.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, insert, update
+from sqlalchemy.orm import Session
+
+from models import Transaction, ArchivedTransaction, TransactionKind, DailyBalance, MonthlyBalance
+from budgets import month_start
+from fx import with_base_amounts
+from archive import live_rows
+
+RESOLUTIONS = ("day", "week", "month")
+
+def _signed(kind: TransactionKind, amount: float) -> float:
+    return amount if kind == TransactionKind.income else -amount
+
+# ---------------------- WRITE PATH ---------------------- #
+def record_daily_nets(db: Session, rows: Iterable[dict], sign: int = 1):
+    """Apply a batch of writes (dicts with username, date, kind, base-currency amount) to the daily and monthly nets"""
+    deltas = defaultdict(float)
+    for row in rows:
+        deltas[(row["username"], row["date"])] += sign * _signed(row["kind"], row["amount"])
+    if not deltas:
+        return
+
+    monthly = defaultdict(float)
+    for (username, d), delta in deltas.items():
+        monthly[(username, month_start(d))] += delta
+    _add_nets(db, DailyBalance, "date", deltas)
+    _add_nets(db, MonthlyBalance, "month", monthly)
+
+def _add_nets(db: Session, model, period: str, deltas: Dict[Tuple[str, date], float]):
+    """Add deltas keyed by (username, period) to a nets table: one executemany for changed rows and one for new rows"""
+    column = getattr(model, period)
+    existing = {
+        (username, p): (balance_id, net)
+        for balance_id, username, p, net in db.query(model.id, model.username, column, model.net).filter(
+            and_(
+                model.username.in_({username for username, _ in deltas}),
+                column.in_({p for _, p in deltas})
+            )
+        ).with_for_update()
+    }
+
+    updates, inserts = [], []
+    for (username, p), delta in deltas.items():
+        if (username, p) in existing:
+            balance_id, net = existing[(username, p)]
+            updates.append({"id": balance_id, "net": net + delta})
+        else:
+            inserts.append({"username": username, period: p, "net": delta})
+    if updates:
+        db.execute(update(model), updates)
+    if inserts:
+        db.execute(insert(model), inserts)
+
+# ---------------------- READ PATH ---------------------- #
+def balance_on(db: Session, username: str, d: date) -> float:
+    """Closing balance on a date: whole months before it, then the days of its own month"""
+    month = month_start(d)
+    months = db.query(func.sum(MonthlyBalance.net)).filter(
+        and_(
+            MonthlyBalance.username == username,
+            MonthlyBalance.month < month
+        )
+    ).scalar()
+    days = db.query(func.sum(DailyBalance.net)).filter(
+        and_(
+            DailyBalance.username == username,
+            DailyBalance.date >= month,
+            DailyBalance.date <= d
+        )
+    ).scalar()
+    return (months or 0.0) + (days or 0.0)
+
+def first_activity(db: Session, username: str) -> Optional[date]:
+    return db.query(func.min(DailyBalance.date)).filter(DailyBalance.username == username).scalar()
+
+def _bucket_ends(start: date, end: date, resolution: str) -> List[date]:
+    """Last day of each day/week/month bucket between start and end"""
+    ends = []
+    current = start
+    while current <= end:
+        if resolution == "day":
+            bucket_end = current
+        elif resolution == "week":
+            bucket_end = current + timedelta(days=6 - current.weekday())
+        else:
+            next_month = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+            bucket_end = next_month - timedelta(days=1)
+        bucket_end = min(bucket_end, end)
+        ends.append(bucket_end)
+        current = bucket_end + timedelta(days=1)
+    return ends
+
+def balance_series(db: Session, username: str, start: date, end: date, resolution: str = "day",
+                   max_points: int = 366) -> List[dict]:
+    """
+    Closing balance at the end of each bucket between start and end, downsampled to at
+    most max_points (the final point is always end). Reads the opening balance plus one
+    row per active day in range, then answers each bucket from prefix sums by bisection.
+    """
+    opening = balance_on(db, username, start - timedelta(days=1))
+    days = db.query(DailyBalance.date, DailyBalance.net).filter(
+        and_(
+            DailyBalance.username == username,
+            DailyBalance.date >= start,
+            DailyBalance.date <= end
+        )
+    ).order_by(DailyBalance.date).all()
+    dates = [d for d, _ in days]
+    # prefix[i] = balance after the first i active days
+    prefix = list(accumulate((net for _, net in days), initial=opening))
+
+    ends = _bucket_ends(start, end, resolution)
+    if len(ends) > max_points:
+        # Keep every step-th bucket, counted back from the last one
+        step = -(-len(ends) // max_points)
+        ends = ends[::-1][::step][::-1]
+
+    return [{"date": d.isoformat(), "balance": prefix[bisect_right(dates, d)]} for d in ends]
+
+# ---------------------- BACKFILL ---------------------- #
+def rebuild_daily_balances(db: Session, username: Optional[str] = None, commit: bool = True):
+    """
+    Recompute daily and monthly nets from the transactions and archive tables (used when migrating existing
+    data). commit=False only flushes, so the caller can make it part of a larger transaction.
+    """
+    for model in (DailyBalance, MonthlyBalance):
+        balances = db.query(model)
+        if username:
+            balances = balances.filter(model.username == username)
+        balances.delete(synchronize_session=False)
+
+    groups = []
+    for model in (Transaction, ArchivedTransaction):
+        query = live_rows(db, model, "username", "date", "kind", "currency").add_columns(func.sum(model.amount))
+        if username:
+            query = query.filter(model.username == username)
+        groups += [
+            {"username": u, "date": d, "kind": k, "currency": cur, "amount": amount}
+            for u, d, k, cur, amount in query.group_by(model.username, model.date, model.kind, model.currency)
+        ]
+
+    nets = defaultdict(float)
+    for row in with_base_amounts(db, groups):
+        nets[(row["username"], row["date"])] += _signed(row["kind"], row["amount"])
+
+    monthly = defaultdict(float)
+    for (u, d), net in nets.items():
+        monthly[(u, month_start(d))] += net
+
+    db.add_all([DailyBalance(username=u, date=d, net=net) for (u, d), net in nets.items()])
+    db.add_all([MonthlyBalance(username=u, month=m, net=net) for (u, m), net in monthly.items()])
+    if commit:
+        db.commit()
+    else:
+        db.flush()
@@ -0,0 +1,289 @@
+"""
+Budget and savings-goal evaluation driven by incremental spend counters
+Every transaction write adjusts a few month-to-date counters (O(1), no history scan)
+and records threshold crossings as BudgetEvent rows that clients poll.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from models import User, Transaction, ArchivedTransaction, TransactionKind, SpendCounter, CategoryBudget, BudgetEvent
+from config import BUDGET_ALERT_THRESHOLDS
+from fx import with_base_amounts
+
+ALL_CATEGORIES = ""
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+# ---------------------- EVALUATION STATE ---------------------- #
+def _crossed(old: Optional[float], new: float, target: float) -> List[int]:
+    """Thresholds (percent of target) reached by moving from old to new; old=None re-checks all"""
+    if not target or target <= 0:
+        return []
+    return [
+        t for t in BUDGET_ALERT_THRESHOLDS
+        if new >= target * t / 100 and (old is None or old < target * t / 100)
+    ]
+
+class BudgetLedger:
+    """
+    Counters, category limits and already-emitted events for a set of users and months,
+    loaded with one query each so that evaluating a whole batch costs a constant number
+    of round trips; everything after loading is dictionary lookups.
+    """
+    def __init__(self, db: Session, usernames: Iterable[str], months: Iterable[date]):
+        self.db = db
+        usernames, months = list(set(usernames)), list(set(months))
+
+        self.counters = {
+            (c.username, c.month, c.kind, c.category): c
+            for c in db.query(SpendCounter).filter(
+                and_(
+                    SpendCounter.username.in_(usernames),
+                    SpendCounter.month.in_(months)
+                )
+            ).with_for_update()
+        }
+        self.limits = {
+            (b.username, b.category): b.monthly_limit
+            for b in db.query(CategoryBudget).filter(CategoryBudget.username.in_(usernames))
+        }
+        self.emitted = set(db.query(
+            BudgetEvent.username, BudgetEvent.month, BudgetEvent.scope,
+            BudgetEvent.category, BudgetEvent.threshold
+        ).filter(
+            and_(
+                BudgetEvent.username.in_(usernames),
+                BudgetEvent.month.in_(months)
+            )
+        ).all())
+        self.events: List[BudgetEvent] = []
+
+    def read(self, username: str, month: date, kind: TransactionKind, category: str = ALL_CATEGORIES) -> float:
+        counter = self.counters.get((username, month, kind, category))
+        return counter.total if counter else 0.0
+
+    def bump(self, username: str, month: date, kind: TransactionKind, category: str,
+             delta: float) -> Tuple[float, float]:
+        """Add delta to a counter, returning its (old, new) total"""
+        key = (username, month, kind, category)
+        counter = self.counters.get(key)
+        if not counter:
+            counter = SpendCounter(username=username, month=month, kind=kind, category=category, total=0.0)
+            self.db.add(counter)
+            self.counters[key] = counter
+        old = counter.total
+        counter.total = old + delta
+        return old, counter.total
+
+    def category_limit(self, username: str, category: str) -> float:
+        return self.limits.get((username, category), 0.0)
+
+    def emit(self, username: str, month: date, scope: str, category: str,
+             old: Optional[float], new: float, target: float):
+        for threshold in _crossed(old, new, target):
+            key = (username, month, scope, category, threshold)
+            if key in self.emitted:
+                continue
+            self.emitted.add(key)
+            event = BudgetEvent(
+                username=username,
+                month=month,
+                scope=scope,
+                category=category,
+                threshold=threshold,
+                amount=new,
+                target=target,
+                created_at=datetime.now()
+            )
+            self.db.add(event)
+            self.events.append(event)
+
+def budget_event_to_dict(event: BudgetEvent) -> dict:
+    if event.scope == "savings":
+        message = f"You reached {event.threshold}% of your savings goal"
+    elif event.scope == "category":
+        message = f"You have used {event.threshold}% of your {event.category} budget"
+    else:
+        message = f"You have used {event.threshold}% of your monthly budget"
+    return {
+        "id": event.id,
+        "month": event.month.isoformat(),
+        "scope": event.scope,
+        "category": event.category or None,
+        "threshold": event.threshold,
+        "amount": event.amount,
+        "target": event.target,
+        "created_at": event.created_at.isoformat(),
+        "message": message
+    }
+
+# ---------------------- WRITE PATH ---------------------- #
+def _apply_month(ledger: BudgetLedger, user: User, month: date, expense_deltas: Dict[str, float],
+                 income_delta: float):
+    """Apply one user-month worth of deltas and evaluate every affected target"""
+    username = user.username
+    for category, delta in expense_deltas.items():
+        old, new = ledger.bump(username, month, TransactionKind.expense, category, delta)
+        ledger.emit(username, month, "category", category, old, new, ledger.category_limit(username, category))
+
+    if expense_deltas:
+        exp_old, exp_new = ledger.bump(username, month, TransactionKind.expense, ALL_CATEGORIES,
+                                       sum(expense_deltas.values()))
+    else:
+        exp_old = exp_new = ledger.read(username, month, TransactionKind.expense)
+
+    if income_delta:
+        inc_old, inc_new = ledger.bump(username, month, TransactionKind.income, ALL_CATEGORIES, income_delta)
+    else:
+        inc_old = inc_new = ledger.read(username, month, TransactionKind.income)
+
+    ledger.emit(username, month, "budget", ALL_CATEGORIES, exp_old, exp_new, user.monthly_budget)
+    ledger.emit(username, month, "savings", ALL_CATEGORIES, inc_old - exp_old, inc_new - exp_new, user.savings_goal)
+
+def record_transactions(db: Session, rows: Iterable[dict], sign: int = 1) -> List[BudgetEvent]:
+    """
+    Apply a batch of transaction writes (dicts with username, date, kind, category and
+    amount in the user's base currency, see fx.with_base_amounts). Deltas are summed per
+    user, month and category first, so a batch costs one counter update per distinct key
+    rather than one per row.
+    """
+    expense = defaultdict(lambda: defaultdict(float))
+    income = defaultdict(float)
+    for row in rows:
+        key = (row["username"], month_start(row["date"]))
+        if row["kind"] == TransactionKind.expense:
+            expense[key][row["category"]] += sign * row["amount"]
+        else:
+            income[key] += sign * row["amount"]
+
+    keys = set(expense) | set(income)
+    if not keys:
+        return []
+
+    usernames = {username for username, _ in keys}
+    users = {u.username: u for u in db.query(User).filter(User.username.in_(usernames))}
+    ledger = BudgetLedger(db, usernames, {month for _, month in keys})
+
+    for username, month in sorted(keys):
+        _apply_month(ledger, users[username], month, expense.get((username, month), {}),
+                     income.get((username, month), 0.0))
+    db.flush()
+    return ledger.events
+
+def reevaluate_month(db: Session, user: User, month: date) -> List[BudgetEvent]:
+    """Check the month's counters against changed targets (budget, goal or category limit)"""
+    ledger = BudgetLedger(db, [user.username], [month])
+    exp_total = ledger.read(user.username, month, TransactionKind.expense)
+    inc_total = ledger.read(user.username, month, TransactionKind.income)
+    ledger.emit(user.username, month, "budget", ALL_CATEGORIES, None, exp_total, user.monthly_budget)
+    ledger.emit(user.username, month, "savings", ALL_CATEGORIES, None, inc_total - exp_total, user.savings_goal)
+
+    for (_, category), limit in ledger.limits.items():
+        spent = ledger.read(user.username, month, TransactionKind.expense, category)
+        ledger.emit(user.username, month, "category", category, None, spent, limit)
+    db.flush()
+    return ledger.events
+
+# ---------------------- READ PATH ---------------------- #
+def month_status(db: Session, user: User, month: date) -> dict:
+    """Month-to-date progress against every target, read straight from the counters"""
+    counters = db.query(SpendCounter).filter(
+        and_(
+            SpendCounter.username == user.username,
+            SpendCounter.month == month
+        )
+    ).all()
+    totals = {(c.kind, c.category): c.total for c in counters}
+    spent = totals.get((TransactionKind.expense, ALL_CATEGORIES), 0.0)
+    earned = totals.get((TransactionKind.income, ALL_CATEGORIES), 0.0)
+
+    categories = [{
+        "category": budget.category,
+        "monthly_limit": budget.monthly_limit,
+        "spent": totals.get((TransactionKind.expense, budget.category), 0.0)
+    } for budget in db.query(CategoryBudget).filter(CategoryBudget.username == user.username).all()]
+
+    return {
+        "month": month.isoformat(),
+        "spent": spent,
+        "income": earned,
+        "monthly_budget": user.monthly_budget,
+        "savings": earned - spent,
+        "savings_goal": user.savings_goal,
+        "categories": categories
+    }
+
+def running_totals(db: Session, username: str, today: Optional[date] = None) -> dict:
+    """All-time and this-month totals summed from the monthly counters (no transaction scan)"""
+    this_month = month_start(today or date.today())
+    totals = {
+        TransactionKind.income: [0.0, 0.0],
+        TransactionKind.expense: [0.0, 0.0]
+    }
+    for kind, month, total in db.query(SpendCounter.kind, SpendCounter.month, SpendCounter.total).filter(
+        and_(
+            SpendCounter.username == username,
+            SpendCounter.category == ALL_CATEGORIES
+        )
+    ):
+        totals[kind][0] += total
+        if month >= this_month:
+            totals[kind][1] += total
+
+    income, expense = totals[TransactionKind.income], totals[TransactionKind.expense]
+    return {
+        "total_income": income[0],
+        "total_expense": expense[0],
+        "net_balance": income[0] - expense[0],
+        "this_month_expense": expense[1],
+        "this_month_income": income[1],
+        "this_month_net": income[1] - expense[1]
+    }
+
+# ---------------------- BACKFILL ---------------------- #
+def rebuild_counters(db: Session, username: Optional[str] = None, commit: bool = True):
+    """
+    Recompute counters from the transactions and archive tables (used when migrating existing
+    data). commit=False only flushes, so the caller can make it part of a larger transaction.
+    """
+    from archive import live_rows  # archive imports month_start from here
+
+    counters = db.query(SpendCounter)
+    if username:
+        counters = counters.filter(SpendCounter.username == username)
+    counters.delete(synchronize_session=False)
+
+    groups = []
+    for model in (Transaction, ArchivedTransaction):
+        query = live_rows(db, model, "username", "date", "kind", "category", "currency").add_columns(
+            func.sum(model.amount)
+        )
+        if username:
+            query = query.filter(model.username == username)
+        groups += [
+            {"username": u, "date": d, "kind": k, "category": c, "currency": cur, "amount": amount}
+            for u, d, k, c, cur, amount in query.group_by(
+                model.username, model.date, model.kind, model.category, model.currency
+            )
+        ]
+
+    totals = defaultdict(float)
+    for row in with_base_amounts(db, groups):
+        month = month_start(row["date"])
+        if row["kind"] == TransactionKind.expense:
+            totals[(row["username"], month, row["kind"], row["category"])] += row["amount"]
+        totals[(row["username"], month, row["kind"], ALL_CATEGORIES)] += row["amount"]
+
+    db.add_all([
+        SpendCounter(username=u, month=m, kind=k, category=c, total=total)
+        for (u, m, k, c), total in totals.items()
+    ])
+    if commit:
+        db.commit()
+    else:
+        db.flush()
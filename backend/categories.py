@@ -0,0 +1,123 @@
+"""
+Category dictionary: per-user category ids and write-time normalization
+"Food", "food " and "FOOD" resolve to one Category row, so filters and grouping
+compare integer ids instead of free-form strings.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import Category, Transaction, RecurringRule, CategoryBudget
+
+def normalize_category(name: str) -> Tuple[str, str]:
+    """Return (display name, lookup key): whitespace collapsed, key case-folded"""
+    display = " ".join(name.split())
+    return display, display.casefold()
+
+def find_category(db: Session, username: str, name: str) -> Optional[Category]:
+    _, key = normalize_category(name)
+    return db.query(Category).filter(
+        and_(
+            Category.username == username,
+            Category.key == key
+        )
+    ).first()
+
+def resolve_categories(db: Session, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Category]:
+    """
+    Map (username, raw name) pairs to Category rows, creating missing ones.
+    Existing rows are fetched with one query per user, so batches stay cheap.
+    """
+    wanted = {}
+    for username, name in dict.fromkeys(pairs):  # deduplicated in input order
+        display, key = normalize_category(name)
+        wanted[(username, name)] = (username, key, display)
+
+    by_user = {}
+    for username, key, _ in wanted.values():
+        by_user.setdefault(username, set()).add(key)
+
+    found = {}
+    for username, keys in by_user.items():
+        for category in db.query(Category).filter(
+            and_(
+                Category.username == username,
+                Category.key.in_(keys)
+            )
+        ):
+            found[(username, category.key)] = category
+
+    result = {}
+    for pair, (username, key, display) in wanted.items():
+        if (username, key) not in found:
+            # First spelling seen becomes the display name
+            found[(username, key)] = _create_category(db, username, key, display)
+        result[pair] = found[(username, key)]
+    return result
+
+def _create_category(db: Session, username: str, key: str, display: str) -> Category:
+    """Insert a category, or return the row a concurrent request inserted first"""
+    try:
+        with db.begin_nested():
+            category = Category(username=username, key=key, name=display, usage_count=0)
+            db.add(category)
+        return category
+    except IntegrityError:
+        # Locking read: a plain SELECT would not see the other transaction's row under REPEATABLE READ
+        return db.query(Category).filter(
+            and_(
+                Category.username == username,
+                Category.key == key
+            )
+        ).with_for_update().one()
+
+def resolve_category(db: Session, username: str, name: str) -> Category:
+    return resolve_categories(db, [(username, name)])[(username, name)]
+
+def adjust_usage(db: Session, deltas: Dict[int, int]):
+    """Apply usage count changes keyed by category id"""
+    for category_id, delta in deltas.items():
+        if delta:
+            db.execute(
+                update(Category)
+                .where(Category.id == category_id)
+                .values(usage_count=Category.usage_count + delta)
+            )
+
+# ---------------------- BACKFILL ---------------------- #
+def backfill_categories(db: Session, batch_size: int = 1000) -> int:
+    """
+    Create categories from existing strings and stamp ids (and canonical names) on old
+    transactions and recurring rules. Returns the number of transactions updated.
+    """
+    updated = 0
+    for model in (Transaction, RecurringRule):
+        while True:
+            rows = db.query(model.id, model.username, model.category).filter(
+                model.category_id.is_(None)
+            ).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            categories = resolve_categories(db, [(r.username, r.category) for r in rows])
+            db.execute(update(model), [{
+                "id": r.id,
+                "category_id": categories[(r.username, r.category)].id,
+                "category": categories[(r.username, r.category)].name
+            } for r in rows])
+            db.commit()
+            if model is Transaction:
+                updated += len(rows)
+
+    for budget in db.query(CategoryBudget).all():
+        budget.category = resolve_category(db, budget.username, budget.category).name
+
+    # Usage counts cover live (non-tombstoned) rows only
+    db.execute(update(Category).values(usage_count=0))
+    adjust_usage(db, dict(db.query(Transaction.category_id, func.count(Transaction.id)).filter(
+        Transaction.deleted_at.is_(None)
+    ).group_by(Transaction.category_id).all()))
+    db.commit()
+    return updated
@@ -0,0 +1,75 @@
+"""
+Worker startup budget check
+Imports main in a fresh interpreter under `python -X importtime` and fails if the
+import gets slower, uses more memory, or pulls in libraries that should load lazily.
+Run before deploying or from CI:  python check_startup.py
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Only the analytics and report routes need these; they must never load at import
+LAZY_MODULES = ["pandas", "numpy", "fpdf", "openpyxl", "pyarrow"]
+
+# Prints the child's peak RSS in KB (ru_maxrss is KB on Linux, bytes on macOS)
+PROBE = (
+    "import main, resource, sys; "
+    "rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss; "
+    "print(rss // 1024 if sys.platform == 'darwin' else rss)"
+)
+
+def parse_importtime(stderr: str) -> dict:
+    """Map top-level module name -> cumulative import time in microseconds"""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            totals[name.strip()] = int(cumulative)
+    return totals
+
+def check_startup(max_import_ms: int, max_rss_mb: int) -> bool:
+    env = dict(os.environ, SECRET_KEY=os.environ.get("SECRET_KEY") or "startup-check")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        print(f"❌ Importing main failed:\n{result.stderr[-2000:]}")
+        return False
+
+    imports = parse_importtime(result.stderr)
+    import_ms = imports.get("main", 0) / 1000
+    rss_mb = int(result.stdout.strip().splitlines()[-1]) / 1024
+    loaded = [m for m in LAZY_MODULES if m in imports]
+
+    print(f"Import time of main: {import_ms:.0f} ms (budget {max_import_ms} ms)")
+    print(f"Peak RSS after import: {rss_mb:.1f} MB (budget {max_rss_mb} MB)")
+
+    ok = True
+    if import_ms > max_import_ms:
+        print("❌ Import time budget exceeded")
+        ok = False
+    if rss_mb > max_rss_mb:
+        print("❌ RSS budget exceeded")
+        ok = False
+    if loaded:
+        print(f"❌ Loaded at import time but should be lazy: {', '.join(loaded)}")
+        ok = False
+    if ok:
+        print("✅ Worker startup within budget")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if API worker startup regresses")
+    parser.add_argument("--max-import-ms", type=int, default=int(os.getenv("STARTUP_MAX_IMPORT_MS", 1000)))
+    parser.add_argument("--max-rss-mb", type=int, default=int(os.getenv("STARTUP_MAX_RSS_MB", 100)))
+    args = parser.parse_args()
+
+    success = check_startup(args.max_import_ms, args.max_rss_mb)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,330 @@
+"""
+Columnar export and import: Parquet and Arrow IPC
+Exports stream Arrow record batches built straight from batched query results (column
+lists, no per-row dicts), so memory stays bounded by the batch size. Bulk exports are
+partitioned Hive-style as OUT_DIR/username=<user>/month=<YYYY-MM>/part-N.<ext>, which
+pandas/pyarrow read back as a dataset; the import path reads the same files.
+pyarrow is imported on first use so that starting an API worker does not load it.
+
+Run `python columnar.py export OUT_DIR` / `python columnar.py import IN_DIR` for bulk admin jobs.
+"""
+from collections import Counter
+from datetime import date
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import quote, unquote
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models import Transaction, ArchivedTransaction, TransactionKind
+from budgets import record_transactions
+from balances import record_daily_nets
+from categories import normalize_category, resolve_categories, adjust_usage
+from fx import rate_cache, with_base_amounts, normalize_currency, UnknownCurrency
+from archive import live_rows
+from sync import stamp_rows
+from duplicates import row_fingerprint, existing_keys
+from config import DUPLICATE_POLICY
+
+BATCH_SIZE = 10000
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Partition columns (username, month) live in the directory names of bulk exports
+EXPORT_COLUMNS = ["id", "date", "kind", "category", "amount", "currency", "description"]
+
+def export_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.date32()),
+        ("kind", pa.string()),
+        ("category", pa.string()),
+        ("amount", pa.float64()),
+        ("currency", pa.string()),
+        ("description", pa.string()),
+    ])
+
+# ---------------------- EXPORT ---------------------- #
+def export_statement(query, model):
+    """Select statement for the export columns of a transactions or archive query"""
+    return query.with_entities(*[getattr(model, c) for c in EXPORT_COLUMNS]).order_by(model.date, model.id).statement
+
+def _to_batch(rows: List[tuple], schema):
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    kind_index = EXPORT_COLUMNS.index("kind")
+    columns[kind_index] = [kind.value for kind in columns[kind_index]]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema
+    )
+
+def record_batches(db: Session, statements: Iterable, batch_size: int = BATCH_SIZE) -> Iterator:
+    """Arrow record batches of up to batch_size rows, fetched with a server-side cursor"""
+    schema = export_schema()
+    for statement in statements:
+        result = db.execute(statement.execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            yield _to_batch(rows, schema)
+
+def _open_writer(sink, fmt: str, schema):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    return pa.ipc.new_file(sink, schema)
+
+class _ChunkSink:
+    """Write-only file whose bytes are drained as they arrive; tell() keeps counting for file offsets"""
+    closed = False
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def stream_export(statements: List, fmt: str, batch_size: int = BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Yield a Parquet or Arrow IPC file chunk by chunk as batches are written.
+    Uses its own database session because it runs after the request's session is closed.
+    """
+    import pyarrow as pa
+    from database import SessionLocal
+
+    db = SessionLocal()
+    sink = _ChunkSink()
+    try:
+        writer = _open_writer(pa.PythonFile(sink, mode="w"), fmt, export_schema())
+        for batch in record_batches(db, statements, batch_size):
+            writer.write_batch(batch)
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+    finally:
+        db.close()
+
+def _write_pending(writer, pending: List[tuple], schema):
+    if pending:
+        writer.write_batch(_to_batch(pending, schema))
+        pending.clear()
+
+def export_all(db: Session, out_dir: str, fmt: str = "parquet", username: Optional[str] = None,
+               batch_size: int = BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Bulk export of every user's live and archived transactions, one file per user, month
+    and table. Rows stream in (username, date) order, so only one writer is open at a time.
+    Returns (files written, rows written).
+    """
+    schema = export_schema()
+    files, written = 0, 0
+    for part, model in enumerate((ArchivedTransaction, Transaction)):
+        query = live_rows(db, model, "username", *EXPORT_COLUMNS)
+        if username:
+            query = query.filter(model.username == username)
+        result = db.execute(
+            query.order_by(model.username, model.date, model.id).statement.execution_options(yield_per=batch_size)
+        )
+
+        current, writer, pending = None, None, []
+        for rows in result.partitions():
+            for row in rows:
+                key = (row[0], row[2].strftime("%Y-%m"))
+                if key != current:
+                    if writer:
+                        _write_pending(writer, pending, schema)
+                        writer.close()
+                    path = os.path.join(out_dir, f"username={quote(key[0], safe='')}", f"month={key[1]}")
+                    os.makedirs(path, exist_ok=True)
+                    writer = _open_writer(os.path.join(path, f"part-{part}{FORMATS[fmt]}"), fmt, schema)
+                    current = key
+                    files += 1
+                pending.append(row[1:])
+                written += 1
+                if len(pending) >= batch_size:
+                    _write_pending(writer, pending, schema)
+        if writer:
+            _write_pending(writer, pending, schema)
+            writer.close()
+    return files, written
+
+# ---------------------- IMPORT ---------------------- #
+def read_batches(source, batch_size: int = BATCH_SIZE) -> Iterator:
+    """Record batches from a Parquet or Arrow IPC file (path or seekable binary file), detected by magic bytes"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            yield from read_batches(f, batch_size)
+        return
+
+    magic = source.read(6)
+    source.seek(0)
+    if magic[:4] == b"PAR1":
+        yield from pq.ParquetFile(source).iter_batches(batch_size=batch_size)
+    elif magic == b"ARROW1":
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    else:
+        raise ValueError("File is neither Parquet nor Arrow IPC")
+
+def import_records(db: Session, username: str, default_currency: str, records: List[dict],
+                   imported_keys: Optional[Set[Tuple[str, date]]] = None) -> Tuple[int, int]:
+    """
+    Insert one batch of exported records for a user and apply them to every aggregate
+    (category usage, budget counters, daily nets) the same set-based way as recurring
+    materialization. Exported ids are ignored; rows are appended. Does not commit.
+    Records matching an existing transaction (same fingerprint and date) are skipped when
+    DUPLICATE_POLICY is "reject" and imported otherwise. imported_keys collects the keys
+    written by earlier batches of the same file, which never count as duplicates.
+    Returns (rows imported, duplicates found).
+    """
+    if not records:
+        return 0, 0
+    imported_keys = set() if imported_keys is None else imported_keys
+
+    categories = resolve_categories(db, [(username, r["category"] or "") for r in records])
+    rows = []
+    for r in records:
+        if r["kind"] not in TransactionKind.__members__:
+            raise ValueError(f"Invalid kind: {r['kind']}")
+        if r["amount"] is None or r["amount"] <= 0 or r["date"] is None:
+            raise ValueError(f"Invalid amount or date: {r}")
+        if not normalize_category(r["category"] or "")[1]:
+            raise ValueError("Category is required")
+
+        currency = normalize_currency(r.get("currency") or default_currency)
+        if not rate_cache.supports(db, currency):
+            raise UnknownCurrency(currency)
+        category = categories[(username, r["category"] or "")]
+        row = {
+            "username": username,
+            "date": r["date"],
+            "category": category.name,
+            "category_id": category.id,
+            "amount": r["amount"],
+            "currency": currency,
+            "description": r.get("description"),
+            "kind": TransactionKind[r["kind"]]
+        }
+        row["fingerprint"] = row_fingerprint(row)
+        rows.append(row)
+
+    # Stamp first: it locks the user's row, so a concurrent import of the same rows has
+    # committed before the check (skipped rows leave unused change_seq values, which is harmless)
+    stamp_rows(db, rows)
+
+    # Identical rows within one file are kept: two equal purchases on a day are legitimate
+    keys = [(row["fingerprint"], row["date"]) for row in rows]
+    existing = existing_keys(db, username, keys) - imported_keys
+    duplicates = sum(1 for key in keys if key in existing)
+    if DUPLICATE_POLICY == "reject":
+        rows = [row for row, key in zip(rows, keys) if key not in existing]
+    imported_keys.update((row["fingerprint"], row["date"]) for row in rows)
+    if not rows:
+        return 0, duplicates
+
+    base_rows = with_base_amounts(db, rows)
+    for row, base_row in zip(rows, base_rows):
+        row["amount_base"] = base_row["amount"]
+    db.execute(insert(Transaction), rows)
+    record_transactions(db, base_rows)
+    adjust_usage(db, Counter(row["category_id"] for row in rows))
+    record_daily_nets(db, base_rows)
+    return len(rows), duplicates
+
+def import_file(db: Session, username: str, default_currency: str, source: BinaryIO,
+                batch_size: int = BATCH_SIZE) -> Tuple[int, int]:
+    """
+    Import one exported file for a user. Does not commit, so a failed file leaves no rows behind.
+    Returns (rows imported, duplicates found).
+    """
+    imported, duplicates, imported_keys = 0, 0, set()
+    for batch in read_batches(source, batch_size):
+        count, found = import_records(db, username, default_currency, batch.to_pylist(), imported_keys)
+        imported += count
+        duplicates += found
+        db.flush()
+    return imported, duplicates
+
+def import_all(db: Session, in_dir: str, batch_size: int = BATCH_SIZE) -> Tuple[int, int, int]:
+    """
+    Import a bulk export directory; each username=<user> directory goes to that user,
+    committed one file at a time. Returns (files imported, rows imported, duplicates found).
+    """
+    from models import User
+
+    files, imported, duplicates = 0, 0, 0
+    for root, _, names in sorted(os.walk(in_dir)):
+        user_dirs = [p for p in os.path.relpath(root, in_dir).split(os.sep) if p.startswith("username=")]
+        if not user_dirs:
+            continue
+        username = unquote(user_dirs[0][len("username="):])
+        user = db.query(User).filter(User.username == username).first()
+        if not user:
+            raise ValueError(f"User not found: {username}")
+
+        for name in sorted(names):
+            if os.path.splitext(name)[1] not in FORMATS.values():
+                continue
+            with open(os.path.join(root, name), "rb") as f:
+                count, found = import_file(db, username, user.base_currency, f, batch_size)
+            imported += count
+            duplicates += found
+            db.commit()
+            files += 1
+    return files, imported, duplicates
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk Parquet / Arrow export and import of transactions")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("path", help="export: output directory; import: directory written by export")
+    parser.add_argument("--format", choices=list(FORMATS), default="parquet")
+    parser.add_argument("--username", help="export a single user")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        began = time.perf_counter()
+        if args.action == "export":
+            files, rows = export_all(db, args.path, args.format, args.username)
+            print(f"✅ Exported {rows} transaction(s) to {files} file(s) in {time.perf_counter() - began:.2f}s")
+        else:
+            files, rows, duplicates = import_all(db, args.path)
+            print(f"✅ Imported {rows} transaction(s) from {files} file(s) in {time.perf_counter() - began:.2f}s "
+                  f"({duplicates} duplicate(s) {'skipped' if DUPLICATE_POLICY == 'reject' else 'imported'})")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error during {args.action}: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
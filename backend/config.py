@@ -9,14 +9,46 @@ DB_PORT = int(os.getenv("DB_PORT", 3306))
 DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 DB_NAME = os.getenv("DB_NAME", "expense_tracker")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # per worker process
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
 
 # Session Configuration
 SECRET_KEY = os.getenv("SECRET_KEY")
 SESSION_EXPIRE_MINUTES = 60 * 24  # 24 hours
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # "database" shares sessions across workers
+
+# Undo Configuration
+UNDO_DEPTH = int(os.getenv("UNDO_DEPTH", 20))  # deletes kept undoable per user (the latest one always is)
+UNDO_TTL_MINUTES = int(os.getenv("UNDO_TTL_MINUTES", 60 * 24))  # 24 hours
+
+# Budget Alert Configuration
+BUDGET_ALERT_THRESHOLDS = [int(t) for t in os.getenv("BUDGET_ALERT_THRESHOLDS", "50,80,100").split(",")]
+
+# Currency Configuration
+BASE_CURRENCY = os.getenv("BASE_CURRENCY", "INR")  # pivot of the FX rate table and default for new users
+FX_CACHE_SECONDS = int(os.getenv("FX_CACHE_SECONDS", 300))  # how long each worker keeps its rate table
+
+# Archive Configuration
+ARCHIVE_HOT_YEARS = int(os.getenv("ARCHIVE_HOT_YEARS", 2))  # current year plus previous ones kept in the hot table
+
+# Duplicate Detection Configuration
+DUPLICATE_POLICY = os.getenv("DUPLICATE_POLICY", "reject")  # "reject" or "flag" exact duplicates on write
+DUPLICATE_WINDOW_DAYS = int(os.getenv("DUPLICATE_WINDOW_DAYS", 3))  # default date window for near-duplicates
+
+# Live Update Configuration
+EVENT_BROKER_URL = os.getenv("EVENT_BROKER_URL", "")  # e.g. redis://localhost:6379/0; empty = in-process
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
 
 # API Configuration
 API_PORT = int(os.getenv("API_PORT", 3000))
 API_HOST = os.getenv("API_HOST", "localhost")
 
+# Server Configuration
+SERVER_MODE = os.getenv("SERVER_MODE", "development")  # "production" runs multi-process workers
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+KEEP_ALIVE_SECONDS = int(os.getenv("KEEP_ALIVE_SECONDS", 5))
+BACKLOG = int(os.getenv("BACKLOG", 2048))
+GRACEFUL_SHUTDOWN_SECONDS = int(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", 30))  # drains in-flight downloads
+
 # Database URL
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
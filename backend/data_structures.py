@@ -1,9 +1,9 @@
 """
-Data Structures: Trie, Heap, Stack implementations
+Data Structures: Trie, Heap implementations
 Preserving original DSA logic from core.py
 """
 import heapq
-from typing import List, Optional
+from typing import List
 
 # ---------------------- TRIE (Smart Search) ---------------------- #
 class TrieNode:
@@ -54,22 +54,3 @@ def get_top_n_expenses(expenses_list: List[dict], n: int = 5) -> List[dict]:
     top = heapq.nlargest(n, amounts_list, key=lambda x: x[0])
     idxs = [i for _, i in top]
     return [expenses_list[i] for i in idxs]
-
-# ---------------------- STACK (Undo Delete) ---------------------- #
-class DeleteStack:
-    def __init__(self):
-        self.stack = []
-
-    def push(self, item):
-        self.stack.append(item)
-
-    def pop(self) -> Optional[dict]:
-        if self.stack:
-            return self.stack.pop()
-        return None
-
-    def is_empty(self) -> bool:
-        return len(self.stack) == 0
-
-    def clear(self):
-        self.stack.clear()
@@ -0,0 +1,122 @@
+"""
+Duplicate transaction detection
+Each transaction stores a fingerprint: a hash of its amount, currency, kind, category id
+and normalized description. Together with the date it forms the (username, fingerprint,
+date) index, so checking a write for an exact duplicate is one index lookup however long
+the history is, and rows that differ only by date come back from the same index already
+sorted by (fingerprint, date), so near-duplicates are found in one sweep over that order.
+Archived transactions keep their fingerprint and count for the write-time checks.
+"""
+from datetime import date
+from hashlib import blake2b
+from typing import Iterable, List, Optional, Set, Tuple
+import re
+
+from sqlalchemy import and_, func, tuple_
+from sqlalchemy.orm import Session
+
+from models import Transaction, ArchivedTransaction
+from archive import live_rows
+
+FINGERPRINT_FIELDS = ["amount", "currency", "kind", "category_id", "description"]
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize_description(text: Optional[str]) -> str:
+    """Case-folded words only: "Coffee @ CCD!" and "coffee ccd" normalize the same"""
+    return " ".join(_NON_WORD.sub(" ", (text or "").casefold()).split())
+
+def fingerprint(amount: float, currency: str, kind, category_id: Optional[int], description: Optional[str]) -> str:
+    """Hash of everything that identifies a transaction except its date"""
+    key = "|".join([
+        f"{amount:.2f}",
+        currency,
+        getattr(kind, "value", kind),
+        str(category_id),
+        normalize_description(description)
+    ])
+    return blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+def row_fingerprint(row) -> str:
+    """Fingerprint of a transaction row given as a dict or an ORM object"""
+    if isinstance(row, dict):
+        return fingerprint(*[row[f] for f in FINGERPRINT_FIELDS])
+    return fingerprint(*[getattr(row, f) for f in FINGERPRINT_FIELDS])
+
+# Both lookups are locking reads (FOR SHARE). Callers hold the user's row lock from stamping
+# change_seq, so a concurrent write has committed by the time they run, but under MySQL's
+# REPEATABLE READ a plain SELECT would still read the snapshot taken earlier in the request.
+def find_duplicate(db: Session, username: str, fp: str, on: date, exclude_id: Optional[int] = None) -> Optional[int]:
+    """Id of a live or archived transaction with the same fingerprint on the same date, if any"""
+    for model in (Transaction, ArchivedTransaction):
+        query = live_rows(db, model, "id").filter(
+            and_(
+                model.username == username,
+                model.fingerprint == fp,
+                model.date == on
+            )
+        )
+        if exclude_id is not None:
+            query = query.filter(model.id != exclude_id)
+        row = query.with_for_update(read=True).first()
+        if row:
+            return row.id
+    return None
+
+def existing_keys(db: Session, username: str, keys: Iterable[Tuple[str, date]]) -> Set[Tuple[str, date]]:
+    """The (fingerprint, date) pairs of a batch that already exist as live or archived transactions"""
+    keys = list(set(keys))
+    if not keys:
+        return set()
+    found = set()
+    for model in (Transaction, ArchivedTransaction):
+        found.update(
+            (row.fingerprint, row.date)
+            for row in live_rows(db, model, "fingerprint", "date").filter(
+                and_(
+                    model.username == username,
+                    tuple_(model.fingerprint, model.date).in_(keys)
+                )
+            ).with_for_update(read=True)
+        )
+    return found
+
+def near_duplicates(db: Session, username: str, window_days: int,
+                    start_date: Optional[date] = None, end_date: Optional[date] = None) -> List[List[Transaction]]:
+    """
+    Groups of live transactions with the same fingerprint where each is dated within
+    window_days of the previous one. Only fingerprints that occur more than once are read,
+    in (fingerprint, date) order, and each row is compared with its predecessor only.
+    """
+    def in_range(query):
+        query = query.filter(
+            and_(
+                Transaction.username == username,
+                Transaction.deleted_at.is_(None)
+            )
+        )
+        if start_date:
+            query = query.filter(Transaction.date >= start_date)
+        if end_date:
+            query = query.filter(Transaction.date <= end_date)
+        return query
+
+    repeated = in_range(db.query(Transaction.fingerprint)).group_by(
+        Transaction.fingerprint
+    ).having(func.count(Transaction.id) > 1).subquery()
+
+    rows = in_range(db.query(Transaction)).filter(
+        Transaction.fingerprint.in_(db.query(repeated.c.fingerprint))
+    ).order_by(Transaction.fingerprint, Transaction.date, Transaction.id)
+
+    groups, group = [], []
+    for t in rows:
+        if group and t.fingerprint == group[-1].fingerprint and (t.date - group[-1].date).days <= window_days:
+            group.append(t)
+            continue
+        if len(group) > 1:
+            groups.append(group)
+        group = [t]
+    if len(group) > 1:
+        groups.append(group)
+    return groups
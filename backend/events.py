@@ -0,0 +1,91 @@
+"""
+Live update pub/sub for Server-Sent Events
+Routes publish small per-user deltas; each open /api/stream connection subscribes
+to its user's channel. The in-process broker only reaches connections on the same
+worker; set EVENT_BROKER_URL to a Redis URL to fan out across workers.
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+from config import EVENT_BROKER_URL
+
+QUEUE_SIZE = 100
+
+# Every queue feeding an open stream on this worker, whichever broker is in use
+_open_queues: Set[asyncio.Queue] = set()
+
+def format_sse(event: str, data: dict) -> str:
+    """Serialize one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def close_streams():
+    """Send a None sentinel to every open stream on this worker so graceful shutdown is not held up"""
+    for queue in list(_open_queues):
+        _offer(queue, None)
+
+def _offer(queue: asyncio.Queue, message: Optional[dict]):
+    # A client too slow to drain its queue loses the oldest delta rather than stalling publishers
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+class InProcessBroker:
+    """Per-user fan-out to asyncio queues owned by this worker"""
+    def __init__(self):
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def publish(self, username: str, message: dict):
+        for queue in self.subscribers.get(username, ()):
+            _offer(queue, message)
+
+    @asynccontextmanager
+    async def subscribe(self, username: str) -> AsyncIterator[asyncio.Queue]:
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers.setdefault(username, set()).add(queue)
+        _open_queues.add(queue)
+        try:
+            yield queue
+        finally:
+            _open_queues.discard(queue)
+            self.subscribers[username].discard(queue)
+            if not self.subscribers[username]:
+                del self.subscribers[username]
+
+class RedisBroker:
+    """Per-user Redis pub/sub channels shared by every worker"""
+    def __init__(self, url: str):
+        import redis.asyncio as redis  # optional dependency, only needed for a shared broker
+
+        self.client = redis.from_url(url)
+
+    @staticmethod
+    def _channel(username: str) -> str:
+        return f"expense-tracker:events:{username}"
+
+    async def publish(self, username: str, message: dict):
+        await self.client.publish(self._channel(username), json.dumps(message, default=str))
+
+    @asynccontextmanager
+    async def subscribe(self, username: str) -> AsyncIterator[asyncio.Queue]:
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self._channel(username))
+
+        async def pump():
+            async for item in pubsub.listen():
+                if item["type"] == "message":
+                    _offer(queue, json.loads(item["data"]))
+
+        task = asyncio.create_task(pump())
+        _open_queues.add(queue)
+        try:
+            yield queue
+        finally:
+            _open_queues.discard(queue)
+            task.cancel()
+            await pubsub.unsubscribe(self._channel(username))
+            await pubsub.close()
+
+broker = RedisBroker(EVENT_BROKER_URL) if EVENT_BROKER_URL else InProcessBroker()
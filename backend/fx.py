@@ -0,0 +1,245 @@
+"""
+Currency conversion: local FX rate table, in-memory rate cache and vectorized conversion
+Rates are stored as the value of one unit of a currency in BASE_CURRENCY (the pivot),
+so any pair converts through it. Rates load from a CSV file; no network access needed.
+Run `python fx.py rates.csv` to load a file with columns date,currency,rate; it then
+rebuilds the base-currency aggregates (and stored base amounts) of every user holding
+foreign-currency transactions.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence
+import csv
+import sys
+import time
+
+from sqlalchemy import and_, update
+from sqlalchemy.orm import Session
+
+from models import User, Transaction, ArchiveSummary, FxRate
+from config import BASE_CURRENCY, FX_CACHE_SECONDS
+
+class UnknownCurrency(ValueError):
+    pass
+
+def normalize_currency(code: str) -> str:
+    return code.strip().upper()
+
+# ---------------------- RATE CACHE ---------------------- #
+class RateCache:
+    """
+    Per-worker copy of the rate table as sorted (date ordinal, rate) arrays per currency.
+    Reloaded after FX_CACHE_SECONDS so rates loaded by another process are picked up.
+    """
+    def __init__(self, ttl: int = FX_CACHE_SECONDS):
+        self.ttl = ttl
+        self.loaded_at = None
+        self.tables = {}
+
+    def _ensure(self, db: Session):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.ttl:
+            self.reload(db)
+
+    def reload(self, db: Session):
+        import numpy as np  # lazy: keep NumPy out of worker startup
+
+        columns = defaultdict(lambda: ([], []))
+        for currency, rate_date, rate in db.query(FxRate.currency, FxRate.date, FxRate.rate).order_by(
+            FxRate.currency, FxRate.date
+        ):
+            columns[currency][0].append(rate_date.toordinal())
+            columns[currency][1].append(rate)
+        self.tables = {
+            currency: (np.array(ordinals, dtype=np.int64), np.array(rates, dtype=float))
+            for currency, (ordinals, rates) in columns.items()
+        }
+        self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def currencies(self, db: Session) -> List[str]:
+        self._ensure(db)
+        return sorted(set(self.tables) | {BASE_CURRENCY})
+
+    def supports(self, db: Session, currency: str) -> bool:
+        self._ensure(db)
+        return currency == BASE_CURRENCY or currency in self.tables
+
+    def to_pivot(self, db: Session, currency: str, ordinals):
+        """Rate in effect on each date (latest on or before it; earliest known before that)"""
+        import numpy as np
+
+        if currency == BASE_CURRENCY:
+            return np.ones(len(ordinals))
+        self._ensure(db)
+        if currency not in self.tables:
+            raise UnknownCurrency(currency)
+        table_dates, table_rates = self.tables[currency]
+        idx = np.searchsorted(table_dates, ordinals, side="right") - 1
+        return table_rates[np.clip(idx, 0, None)]
+
+    def to_pivot_one(self, db: Session, currency: str, d: date) -> float:
+        """Scalar lookup for single writes, without building arrays"""
+        if currency == BASE_CURRENCY:
+            return 1.0
+        self._ensure(db)
+        if currency not in self.tables:
+            raise UnknownCurrency(currency)
+        table_dates, table_rates = self.tables[currency]
+        return float(table_rates[max(bisect_right(table_dates, d.toordinal()) - 1, 0)])
+
+rate_cache = RateCache()
+
+# ---------------------- CONVERSION ---------------------- #
+def convert(db: Session, amounts: Sequence[float], currencies: Sequence[str], dates: Sequence[date], target: str):
+    """
+    Convert amounts to target currency at each row's date and return a NumPy array.
+    Lookups are one searchsorted per distinct currency, so mixed-currency rows cost
+    about the same as a plain sum; rows already in target skip the lookup entirely.
+    """
+    import numpy as np
+
+    amounts = np.asarray(amounts, dtype=float)
+    currencies = np.asarray(currencies)
+    if len(amounts) == 0:
+        return amounts
+    uniq, inverse = np.unique(currencies, return_inverse=True)
+    if len(uniq) == 1 and uniq[0] == target:
+        return amounts
+
+    ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(amounts))
+    factors = np.empty(len(amounts))
+    for i, currency in enumerate(uniq):
+        mask = inverse == i
+        factors[mask] = rate_cache.to_pivot(db, currency, ordinals[mask])
+    return amounts * factors / rate_cache.to_pivot(db, target, ordinals)
+
+def convert_one(db: Session, amount: float, currency: str, d: date, target: str) -> float:
+    if currency == target:
+        return amount
+    return amount * rate_cache.to_pivot_one(db, currency, d) / rate_cache.to_pivot_one(db, target, d)
+
+def base_currencies(db: Session, usernames: Iterable[str]) -> Dict[str, str]:
+    return dict(db.query(User.username, User.base_currency).filter(User.username.in_(set(usernames))).all())
+
+def with_base_amounts(db: Session, rows: List[dict]) -> List[dict]:
+    """
+    Copy rows (dicts with username, date, currency, amount) with amount converted to each
+    user's base currency, as expected by the incremental counters. One vectorized
+    conversion per distinct base currency in the batch.
+    """
+    if not rows:
+        return []
+    bases = base_currencies(db, (row["username"] for row in rows))
+    result = [dict(row) for row in rows]
+
+    by_target = defaultdict(list)
+    for i, row in enumerate(rows):
+        by_target[bases.get(row["username"], BASE_CURRENCY)].append(i)
+
+    for target, idxs in by_target.items():
+        if len(idxs) == 1:
+            row = rows[idxs[0]]
+            result[idxs[0]]["amount"] = convert_one(db, row["amount"], row["currency"], row["date"], target)
+            continue
+        converted = convert(
+            db,
+            [rows[i]["amount"] for i in idxs],
+            [rows[i]["currency"] for i in idxs],
+            [rows[i]["date"] for i in idxs],
+            target
+        )
+        for i, amount in zip(idxs, converted.tolist()):
+            result[i]["amount"] = amount
+    return result
+
+# ---------------------- LOADING ---------------------- #
+def rebuild_base_amounts(db: Session, username: Optional[str] = None, batch_size: int = 5000,
+                         commit: bool = True) -> int:
+    """
+    Recompute transactions.amount_base (the stored base-currency amount used for ranking)
+    after rates or a user's base currency change. Commits per batch unless commit=False;
+    returns rows updated.
+    """
+    updated, last_id = 0, 0
+    while True:
+        query = db.query(
+            Transaction.id, Transaction.username, Transaction.date, Transaction.currency, Transaction.amount
+        ).filter(Transaction.id > last_id)
+        if username:
+            query = query.filter(Transaction.username == username)
+        batch = query.order_by(Transaction.id).limit(batch_size).all()
+        if not batch:
+            return updated
+
+        rows = with_base_amounts(db, [row._asdict() for row in batch])
+        db.execute(update(Transaction), [{"id": row["id"], "amount_base": row["amount"]} for row in rows])
+        if commit:
+            db.commit()
+        updated += len(rows)
+        last_id = batch[-1].id
+
+def load_rates_csv(db: Session, path: str) -> int:
+    """Insert or replace rates from a CSV file with header date,currency,rate"""
+    rates = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            currency = normalize_currency(row["currency"])
+            rate = float(row["rate"])
+            if rate <= 0:
+                raise ValueError(f"Rate must be positive: {row}")
+            rates[(currency, date.fromisoformat(row["date"].strip()))] = rate
+
+    by_currency = defaultdict(list)
+    for currency, rate_date in rates:
+        by_currency[currency].append(rate_date)
+    for currency, dates in by_currency.items():
+        db.query(FxRate).filter(
+            and_(
+                FxRate.currency == currency,
+                FxRate.date.in_(dates)
+            )
+        ).delete(synchronize_session=False)
+
+    db.add_all([FxRate(currency=c, date=d, rate=r) for (c, d), r in rates.items()])
+    db.commit()
+    rate_cache.invalidate()
+    return len(rates)
+
+def users_with_foreign_amounts(db: Session) -> List[str]:
+    """Users whose aggregates depend on FX rates (any transaction, live or archived, not in their base currency)"""
+    usernames = set()
+    for model in (Transaction, ArchiveSummary):
+        usernames.update(username for (username,) in db.query(model.username).join(
+            User, User.username == model.username
+        ).filter(model.currency != User.base_currency).distinct())
+    return sorted(usernames)
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    from budgets import rebuild_counters
+    from balances import rebuild_daily_balances
+
+    if len(sys.argv) != 2:
+        print("Usage: python fx.py rates.csv")
+        sys.exit(1)
+
+    db = SessionLocal()
+    try:
+        loaded = load_rates_csv(db, sys.argv[1])
+        print(f"✅ Loaded {loaded} FX rate(s) against {BASE_CURRENCY}")
+
+        # Counters, daily nets and stored base amounts were converted at the old rates
+        usernames = users_with_foreign_amounts(db)
+        for username in usernames:
+            rebuild_counters(db, username)
+            rebuild_daily_balances(db, username)
+            rebuild_base_amounts(db, username)
+        print(f"✅ Rebuilt aggregates for {len(usernames)} user(s)")
+    except Exception as e:
+        print(f"❌ Error loading FX rates: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
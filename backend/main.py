@@ -1,30 +1,59 @@
 """
 FastAPI Backend - Expense Tracker API
 """
-import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, func, text
 from datetime import date, datetime, timedelta
 from typing import List, Optional
-import pandas as pd
-import numpy as np
 from pydantic import BaseModel
 from itsdangerous import URLSafeTimedSerializer
 
-from database import get_db, Base, engine
-from models import User, Transaction, TransactionKind
+from database import get_db, Base, engine, SessionLocal
+from models import (
+    User, Transaction, TransactionKind, RecurringRule, RecurrenceFrequency, CategoryBudget, BudgetEvent, Category,
+    ArchiveSummary, ArchivedTransaction
+)
 from auth import hash_text, verify_hash
-from data_structures import Trie, get_top_n_expenses, DeleteStack
-from reports import generate_pdf_report, generate_csv_report, generate_excel_report
-from config import SECRET_KEY
+from data_structures import Trie
+from reports import report_rows, generate_pdf_report, generate_csv_report, generate_excel_report
+from undo import tombstone_transaction, restore_last_deleted
+from recurring import materialize_due
+from budgets import (
+    record_transactions, reevaluate_month, month_start, month_status, budget_event_to_dict, running_totals,
+    rebuild_counters
+)
+from events import broker, format_sse
+from session_store import session_store
+from balances import (
+    record_daily_nets, balance_on, balance_series, first_activity, rebuild_daily_balances, RESOLUTIONS
+)
+from categories import normalize_category, find_category, resolve_category, adjust_usage
+from archive import history_models, reserve_archived_ids
+from sync import stamp_change, changes_since, SNAPSHOT_TABLES
+from columnar import export_statement, stream_export, import_file
+from duplicates import row_fingerprint, find_duplicate, near_duplicates
+from fx import (
+    rate_cache, convert, convert_one, with_base_amounts, rebuild_base_amounts, normalize_currency, UnknownCurrency
+)
+from config import SECRET_KEY, SSE_HEARTBEAT_SECONDS, DUPLICATE_POLICY, DUPLICATE_WINDOW_DAYS
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables at startup rather than at import, so importing main stays cheap
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        reserve_archived_ids(db)
+    finally:
+        db.close()
+    yield
 
-app = FastAPI(title="Expense Tracker API", version="1.0.0")
+app = FastAPI(title="Expense Tracker API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware for React frontend
 app.add_middleware(
@@ -41,12 +70,6 @@ app.add_middleware(
 # Session serializer
 serializer = URLSafeTimedSerializer(SECRET_KEY)
 
-# In-memory session store (for production, use Redis or database)
-sessions = {}
-
-# In-memory delete stack per user
-delete_stacks = {}
-
 # ---------------------- PYDANTIC MODELS ---------------------- #
 class UserRegister(BaseModel):
     username: str
@@ -69,12 +92,25 @@ class TransactionCreate(BaseModel):
     amount: float
     description: str
     kind: str  # "expense" or "income"
+    currency: Optional[str] = None  # defaults to the user's base currency
+    allow_duplicate: bool = False  # save even if an identical transaction exists on that date
 
 class TransactionUpdate(BaseModel):
     date: date
     category: str
     amount: float
     description: str
+    currency: Optional[str] = None  # defaults to the transaction's current currency
+
+class RecurringRuleCreate(BaseModel):
+    category: str
+    amount: float
+    description: str
+    kind: str  # "expense" or "income"
+    currency: Optional[str] = None
+    frequency: str  # "daily", "weekly" or "monthly"
+    start_date: date
+    end_date: Optional[date] = None
 
 class BudgetUpdate(BaseModel):
     monthly_budget: float
@@ -82,6 +118,13 @@ class BudgetUpdate(BaseModel):
 class SavingsGoalUpdate(BaseModel):
     savings_goal: float
 
+class BaseCurrencyUpdate(BaseModel):
+    base_currency: str
+
+class CategoryBudgetUpdate(BaseModel):
+    category: str
+    monthly_limit: float
+
 # ---------------------- SESSION HELPERS ---------------------- #
 def get_session_username(request: Request) -> Optional[str]:
     """Get username from session cookie"""
@@ -90,7 +133,7 @@ def get_session_username(request: Request) -> Optional[str]:
         return None
     try:
         username = serializer.loads(session_id, max_age=86400)  # 24 hours
-        if username in sessions:
+        if session_store.exists(username):
             return username
     except:
         pass
@@ -99,7 +142,7 @@ def get_session_username(request: Request) -> Optional[str]:
 def create_session(response: Response, username: str):
     """Create session and set cookie"""
     session_id = serializer.dumps(username)
-    sessions[username] = {"username": username, "created_at": datetime.now()}
+    session_store.add(username)
     response.set_cookie(
         key="session_id",
         value=session_id,
@@ -111,16 +154,128 @@ def create_session(response: Response, username: str):
 
 def delete_session(response: Response, username: str):
     """Delete session"""
-    if username in sessions:
-        del sessions[username]
-    if username in delete_stacks:
-        del delete_stacks[username]
+    session_store.remove(username)
     response.delete_cookie(
         key="session_id",
         samesite="lax", # "lax" for HTTP, "none" for HTTPS
         secure=False # "True" for HTTPS, "False" for HTTP
     )
 
+# ---------------------- QUERY HELPERS ---------------------- #
+def active_transactions(db: Session, username: str):
+    """Query a user's transactions, excluding tombstoned (deleted) rows"""
+    return db.query(Transaction).filter(
+        and_(
+            Transaction.username == username,
+            Transaction.deleted_at.is_(None)
+        )
+    )
+
+def transaction_history(db: Session, user: User, start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """
+    (model, query) pairs covering a date range: the hot table, plus the archive only when
+    the range reaches the user's archived years. Both tables share column names.
+    """
+    queries = []
+    for model in history_models(user, start_date):
+        query = active_transactions(db, user.username) if model is Transaction else db.query(model).filter(
+            model.username == user.username
+        )
+        if start_date:
+            query = query.filter(model.date >= start_date)
+        if end_date:
+            query = query.filter(model.date <= end_date)
+        queries.append((model, query))
+    return queries
+
+def transaction_for_write(db: Session, user: User, transaction_id: int) -> Transaction:
+    """Live transaction to update or delete; archived ones are listed but read-only"""
+    t = active_transactions(db, user.username).filter(Transaction.id == transaction_id).first()
+    if t:
+        return t
+    if user.archived_through and db.query(ArchivedTransaction.id).filter(
+        and_(
+            ArchivedTransaction.username == user.username,
+            ArchivedTransaction.id == transaction_id
+        )
+    ).first():
+        raise HTTPException(status_code=409, detail="Archived transactions are read-only")
+    raise HTTPException(status_code=404, detail="Transaction not found")
+
+def category_for_write(db: Session, username: str, name: str) -> Category:
+    """Resolve a submitted category name to the user's category dictionary entry"""
+    if not normalize_category(name)[1]:
+        raise HTTPException(status_code=400, detail="Category is required")
+    return resolve_category(db, username, name)
+
+def currency_for_write(db: Session, code: Optional[str], default: str) -> str:
+    """Validate a submitted currency code against the FX rate table"""
+    if code is None:
+        return default
+    currency = normalize_currency(code)
+    if not rate_cache.supports(db, currency):
+        raise HTTPException(status_code=400, detail=f"No FX rates loaded for currency {currency}")
+    return currency
+
+def apply_counters(db: Session, t: Transaction, sign: int = 1) -> List[BudgetEvent]:
+    """Add (sign=1) or remove (sign=-1) a transaction from every incrementally maintained aggregate"""
+    adjust_usage(db, {t.category_id: sign})
+    rows = with_base_amounts(db, [{
+        "username": t.username,
+        "date": t.date,
+        "kind": t.kind,
+        "category": t.category,
+        "currency": t.currency,
+        "amount": t.amount
+    }])
+    if sign > 0:
+        t.amount_base = rows[0]["amount"]  # stored for ranking (top expenses)
+    record_daily_nets(db, rows, sign)
+    return record_transactions(db, rows, sign)
+
+def transaction_to_dict(t: Transaction) -> dict:
+    return {
+        "id": t.id,
+        "date": t.date.isoformat(),
+        "category": t.category,
+        "amount": t.amount,
+        "currency": t.currency,
+        "description": t.description,
+        "kind": t.kind.value,
+        "change_seq": t.change_seq,
+        "archived": isinstance(t, ArchivedTransaction)  # read-only: cannot be edited or deleted
+    }
+
+# ---------------------- LIVE UPDATES ---------------------- #
+def top_expenses(db: Session, user: User, n: int = 5) -> List[dict]:
+    """Largest expenses in the user's base currency, read from the stored amount_base index"""
+    expenses = active_transactions(db, user.username).filter(
+        Transaction.kind == TransactionKind.expense
+    ).order_by(Transaction.amount_base.desc()).limit(n).all()
+    
+    return [{
+        "amount": t.amount_base,
+        "currency": user.base_currency,
+        "original_amount": t.amount,
+        "original_currency": t.currency,
+        "date": t.date.isoformat(),
+        "category": t.category,
+        "description": t.description
+    } for t in expenses]
+
+async def publish_change(db: Session, user: User, event: str, transaction: dict, alerts: Optional[List[dict]] = None):
+    """Push a transaction delta with refreshed totals and top 5 to the user's live streams"""
+    await broker.publish(user.username, {
+        "event": event,
+        "data": {
+            "transaction": transaction,
+            "totals": running_totals(db, user.username),
+            "top5_expenses": top_expenses(db, user)
+        }
+    })
+    for alert in alerts or []:
+        await broker.publish(user.username, {"event": "budget.alert", "data": alert})
+
 # ---------------------- DEPENDENCIES ---------------------- #
 def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
     """Dependency to get current authenticated user"""
@@ -138,6 +293,26 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> User:
         )
     return user
 
+# ---------------------- HEALTH ROUTES ---------------------- #
+@app.get("/api/health")
+async def health():
+    """Liveness: the worker is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/api/health/ready")
+async def readiness():
+    """Readiness: the database answers through this worker's connection pool"""
+    pool = engine.pool.status()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "database": str(e), "pool": pool}
+        )
+    return {"status": "ok", "database": "ok", "pool": pool}
+
 # ---------------------- AUTH ROUTES ---------------------- #
 @app.post("/api/auth/register")
 async def register(user_data: UserRegister, db: Session = Depends(get_db)):
@@ -194,7 +369,8 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
     return {
         "username": current_user.username,
         "savings_goal": current_user.savings_goal,
-        "monthly_budget": current_user.monthly_budget
+        "monthly_budget": current_user.monthly_budget,
+        "base_currency": current_user.base_currency
     }
 
 @app.post("/api/auth/reset-password")
@@ -226,35 +402,27 @@ async def get_transactions(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get user transactions with optional filters"""
-    query = db.query(Transaction).filter(Transaction.username == current_user.username)
-    
-    if kind:
-        kind_enum = TransactionKind.expense if kind == "expense" else TransactionKind.income
-        query = query.filter(Transaction.kind == kind_enum)
-    
+    """Get user transactions with optional filters (archived years included when the range reaches them)"""
+    category_row = None
     if category:
-        query = query.filter(Transaction.category == category)
-    
-    if start_date:
-        query = query.filter(Transaction.date >= start_date)
-    
-    if end_date:
-        query = query.filter(Transaction.date <= end_date)
-    
-    transactions = query.order_by(Transaction.date.desc()).all()
-    
-    # Convert to dict list
-    result = []
-    for t in transactions:
-        result.append({
-            "id": t.id,
-            "date": t.date.isoformat(),
-            "category": t.category,
-            "amount": t.amount,
-            "description": t.description,
-            "kind": t.kind.value
-        })
+        category_row = find_category(db, current_user.username, category)
+        if not category_row:
+            return {"transactions": []}
+    
+    transactions = []
+    for model, query in transaction_history(db, current_user, start_date, end_date):
+        if kind:
+            kind_enum = TransactionKind.expense if kind == "expense" else TransactionKind.income
+            query = query.filter(model.kind == kind_enum)
+        
+        if category_row:
+            # Integer comparison on the (username, category_id, date) index
+            query = query.filter(model.category_id == category_row.id)
+        
+        transactions += query.order_by(model.date.desc()).all()
+    
+    transactions.sort(key=lambda t: t.date, reverse=True)
+    result = [transaction_to_dict(t) for t in transactions]
     
     # Search filter (client-side for simplicity, or use SQL LIKE)
     if search:
@@ -268,6 +436,59 @@ async def get_transactions(
     
     return {"transactions": result}
 
+@app.get("/api/transactions/changes")
+async def get_transaction_changes(
+    since: int = 0,
+    after: int = 0,
+    table: str = "archive",
+    limit: int = 1000,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Delta sync: transactions inserted, updated or deleted after change sequence `since`.
+    Pass the returned `seq`, `table` and `after` back as `since`, `table` and `after`, again
+    while `has_more`; `reset` means drop the local cache (the snapshot that follows is paged the same way).
+    """
+    if since < 0 or after < 0 or limit < 1:
+        raise HTTPException(status_code=400, detail="since and after must be >= 0 and limit >= 1")
+    if table not in SNAPSHOT_TABLES:
+        raise HTTPException(status_code=400, detail=f"table must be one of: {', '.join(SNAPSHOT_TABLES)}")
+    
+    changes = changes_since(db, current_user, since, min(limit, 10000), after, table)
+    
+    return {
+        "reset": changes["reset"],
+        "seq": changes["seq"],
+        "table": changes["table"],
+        "after": changes["after"],
+        "has_more": changes["has_more"],
+        "changed": [transaction_to_dict(t) for t in changes["rows"]],
+        "deleted": [{"id": t.id, "change_seq": t.change_seq} for t in changes["deleted"]]
+    }
+
+@app.get("/api/transactions/duplicates")
+async def get_duplicate_transactions(
+    window_days: int = DUPLICATE_WINDOW_DAYS,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Groups of likely duplicates: same amount, currency, type, category and description,
+    each dated within window_days of the previous one (0 = same day only)
+    """
+    if window_days < 0:
+        raise HTTPException(status_code=400, detail="window_days must be >= 0")
+    
+    groups = near_duplicates(db, current_user.username, window_days, start_date, end_date)
+    
+    return {
+        "window_days": window_days,
+        "groups": [[transaction_to_dict(t) for t in group] for group in groups]
+    }
+
 @app.post("/api/transactions")
 async def create_transaction(
     transaction: TransactionCreate,
@@ -279,27 +500,43 @@ async def create_transaction(
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
     
     kind_enum = TransactionKind.income if transaction.kind == "income" else TransactionKind.expense
+    currency = currency_for_write(db, transaction.currency, current_user.base_currency)
+    category = category_for_write(db, current_user.username, transaction.category)
     
     new_transaction = Transaction(
         username=current_user.username,
         date=transaction.date,
-        category=transaction.category,
+        category=category.name,
+        category_id=category.id,
         amount=transaction.amount,
+        currency=currency,
         description=transaction.description,
         kind=kind_enum
     )
+    new_transaction.fingerprint = row_fingerprint(new_transaction)
+    
+    # Stamping locks the user's row, so a double submit waits here until the first one commits;
+    # find_duplicate then uses a locking read, which sees it despite the request's older snapshot
+    stamp_change(db, new_transaction)
+    duplicate_of = find_duplicate(db, current_user.username, new_transaction.fingerprint, new_transaction.date)
+    if duplicate_of and DUPLICATE_POLICY == "reject" and not transaction.allow_duplicate:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Duplicate of transaction #{duplicate_of} (same date, amount, category and description)"
+        )
     
     db.add(new_transaction)
+    alerts = apply_counters(db, new_transaction)
     db.commit()
     db.refresh(new_transaction)
     
+    alerts = [budget_event_to_dict(e) for e in alerts]
+    await publish_change(db, current_user, "transaction.created", transaction_to_dict(new_transaction), alerts)
+    
     return {
-        "id": new_transaction.id,
-        "date": new_transaction.date.isoformat(),
-        "category": new_transaction.category,
-        "amount": new_transaction.amount,
-        "description": new_transaction.description,
-        "kind": new_transaction.kind.value,
+        **transaction_to_dict(new_transaction),
+        "alerts": alerts,
+        "duplicate_of": duplicate_of,
         "message": "Transaction created successfully"
     }
 
@@ -311,34 +548,37 @@ async def update_transaction(
     db: Session = Depends(get_db)
 ):
     """Update a transaction"""
-    t = db.query(Transaction).filter(
-        and_(
-            Transaction.id == transaction_id,
-            Transaction.username == current_user.username
-        )
-    ).first()
-    
-    if not t:
-        raise HTTPException(status_code=404, detail="Transaction not found")
+    t = transaction_for_write(db, current_user, transaction_id)
     
     if transaction.amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
     
+    currency = currency_for_write(db, transaction.currency, t.currency)
+    category = category_for_write(db, current_user.username, transaction.category)
+    
+    # Move the old values out of the aggregates and the new ones in
+    stamp_change(db, t)
+    apply_counters(db, t, -1)
     t.date = transaction.date
-    t.category = transaction.category
+    t.category = category.name
+    t.category_id = category.id
     t.amount = transaction.amount
+    t.currency = currency
     t.description = transaction.description
+    t.fingerprint = row_fingerprint(t)
+    alerts = apply_counters(db, t)
+    duplicate_of = find_duplicate(db, current_user.username, t.fingerprint, t.date, exclude_id=t.id)
     
     db.commit()
     db.refresh(t)
     
+    alerts = [budget_event_to_dict(e) for e in alerts]
+    await publish_change(db, current_user, "transaction.updated", transaction_to_dict(t), alerts)
+    
     return {
-        "id": t.id,
-        "date": t.date.isoformat(),
-        "category": t.category,
-        "amount": t.amount,
-        "description": t.description,
-        "kind": t.kind.value,
+        **transaction_to_dict(t),
+        "alerts": alerts,
+        "duplicate_of": duplicate_of,
         "message": "Transaction updated successfully"
     }
 
@@ -349,33 +589,17 @@ async def delete_transaction(
     db: Session = Depends(get_db)
 ):
     """Delete a transaction (with undo support)"""
-    t = db.query(Transaction).filter(
-        and_(
-            Transaction.id == transaction_id,
-            Transaction.username == current_user.username
-        )
-    ).first()
+    t = transaction_for_write(db, current_user, transaction_id)
     
-    if not t:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    # Store in delete stack for undo
-    if current_user.username not in delete_stacks:
-        delete_stacks[current_user.username] = DeleteStack()
-    
-    delete_stacks[current_user.username].push({
-        "id": t.id,
-        "username": t.username,
-        "date": t.date.isoformat(),
-        "category": t.category,
-        "amount": t.amount,
-        "description": t.description,
-        "kind": t.kind.value
-    })
-    
-    db.delete(t)
+    # Tombstone instead of deleting so the delete can be undone
+    stamp_change(db, t)
+    change_seq = t.change_seq
+    apply_counters(db, t, -1)
+    tombstone_transaction(db, t)
     db.commit()
     
+    await publish_change(db, current_user, "transaction.deleted", {"id": transaction_id, "change_seq": change_seq})
+    
     return {"message": "Transaction deleted successfully"}
 
 @app.post("/api/transactions/undo")
@@ -384,88 +608,187 @@ async def undo_delete(
     db: Session = Depends(get_db)
 ):
     """Undo last delete"""
-    if current_user.username not in delete_stacks:
+    restored = restore_last_deleted(db, current_user.username)
+    
+    if not restored:
         raise HTTPException(status_code=400, detail="No deleted transaction to undo")
     
-    stack = delete_stacks[current_user.username]
-    deleted = stack.pop()
+    stamp_change(db, restored)
+    alerts = apply_counters(db, restored)
+    db.commit()
     
-    if not deleted:
-        raise HTTPException(status_code=400, detail="No deleted transaction to undo")
+    alerts = [budget_event_to_dict(e) for e in alerts]
+    await publish_change(db, current_user, "transaction.restored", transaction_to_dict(restored), alerts)
     
-    kind_enum = TransactionKind.income if deleted["kind"] == "income" else TransactionKind.expense
+    return {
+        **transaction_to_dict(restored),
+        "alerts": alerts,
+        "message": "Transaction restored successfully"
+    }
+
+# ---------------------- RECURRING ROUTES ---------------------- #
+def recurring_rule_to_dict(rule: RecurringRule) -> dict:
+    return {
+        "id": rule.id,
+        "category": rule.category,
+        "amount": rule.amount,
+        "currency": rule.currency,
+        "description": rule.description,
+        "kind": rule.kind.value,
+        "frequency": rule.frequency.value,
+        "start_date": rule.start_date.isoformat(),
+        "end_date": rule.end_date.isoformat() if rule.end_date else None,
+        "next_date": rule.next_date.isoformat() if rule.next_date else None
+    }
+
+@app.get("/api/recurring")
+async def get_recurring_rules(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get user recurring rules"""
+    rules = db.query(RecurringRule).filter(
+        RecurringRule.username == current_user.username
+    ).order_by(RecurringRule.start_date).all()
     
-    restored = Transaction(
-        id=deleted["id"],
-        username=deleted["username"],
-        date=datetime.fromisoformat(deleted["date"]).date(),
-        category=deleted["category"],
-        amount=deleted["amount"],
-        description=deleted["description"],
-        kind=kind_enum
+    return {"rules": [recurring_rule_to_dict(rule) for rule in rules]}
+
+@app.post("/api/recurring")
+async def create_recurring_rule(
+    rule_data: RecurringRuleCreate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create a recurring rule and materialize any occurrences already due"""
+    if rule_data.amount <= 0:
+        raise HTTPException(status_code=400, detail="Amount must be greater than 0")
+    
+    if rule_data.frequency not in RecurrenceFrequency.__members__:
+        raise HTTPException(status_code=400, detail="Frequency must be daily, weekly or monthly")
+    
+    if rule_data.end_date and rule_data.end_date < rule_data.start_date:
+        raise HTTPException(status_code=400, detail="End date must be on or after start date")
+    
+    kind_enum = TransactionKind.income if rule_data.kind == "income" else TransactionKind.expense
+    currency = currency_for_write(db, rule_data.currency, current_user.base_currency)
+    category = category_for_write(db, current_user.username, rule_data.category)
+    
+    rule = RecurringRule(
+        username=current_user.username,
+        category=category.name,
+        category_id=category.id,
+        amount=rule_data.amount,
+        currency=currency,
+        description=rule_data.description,
+        kind=kind_enum,
+        frequency=RecurrenceFrequency[rule_data.frequency],
+        start_date=rule_data.start_date,
+        end_date=rule_data.end_date,
+        next_date=rule_data.start_date
     )
     
-    db.add(restored)
+    db.add(rule)
     db.commit()
-    db.refresh(restored)
     
-    return {"message": "Transaction restored successfully"}
+    created = materialize_due(db, username=current_user.username)
+    db.refresh(rule)
+    
+    if created:
+        await publish_change(db, current_user, "transactions.materialized", {"recurring_rule_id": rule.id, "count": created})
+    
+    return {
+        **recurring_rule_to_dict(rule),
+        "materialized": created,
+        "message": "Recurring rule created successfully"
+    }
 
-# ---------------------- DASHBOARD ROUTES ---------------------- #
-@app.get("/api/dashboard")
-async def get_dashboard(
+@app.delete("/api/recurring/{rule_id}")
+async def delete_recurring_rule(
+    rule_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get dashboard data"""
-    transactions = db.query(Transaction).filter(
-        Transaction.username == current_user.username
-    ).all()
+    """Delete a recurring rule (already materialized transactions are kept)"""
+    rule = db.query(RecurringRule).filter(
+        and_(
+            RecurringRule.id == rule_id,
+            RecurringRule.username == current_user.username
+        )
+    ).first()
     
-    expenses = [t for t in transactions if t.kind == TransactionKind.expense]
-    incomes = [t for t in transactions if t.kind == TransactionKind.income]
+    if not rule:
+        raise HTTPException(status_code=404, detail="Recurring rule not found")
     
-    total_income = sum(t.amount for t in incomes)
-    total_expense = sum(t.amount for t in expenses)
-    net_balance = total_income - total_expense
+    db.delete(rule)
+    db.commit()
     
-    # This month calculations
-    today = date.today()
-    this_month_start = date(today.year, today.month, 1)
+    return {"message": "Recurring rule deleted successfully"}
+
+# ---------------------- LIVE UPDATE ROUTES ---------------------- #
+@app.get("/api/stream")
+async def stream_updates(request: Request):
+    """Server-Sent Events stream of transaction deltas, totals, top 5 and budget alerts"""
+    username = get_session_username(request)
+    if not username:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
     
-    this_month_expenses = [t for t in expenses if t.date >= this_month_start]
-    this_month_incomes = [t for t in incomes if t.date >= this_month_start]
+    async def event_stream():
+        async with broker.subscribe(username) as queue:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    # Worker is shutting down; EventSource reconnects to another worker
+                    break
+                yield format_sse(message["event"], message["data"])
     
-    this_month_exp = sum(t.amount for t in this_month_expenses)
-    this_month_inc = sum(t.amount for t in this_month_incomes)
-    this_month_net = this_month_inc - this_month_exp
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ---------------------- CATEGORY ROUTES ---------------------- #
+@app.get("/api/categories")
+async def get_categories(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get user categories with usage counts, most used first"""
+    categories = db.query(Category).filter(
+        Category.username == current_user.username
+    ).order_by(Category.usage_count.desc(), Category.name).all()
     
-    # Top 5 expenses
-    expenses_list = [{"amount": t.amount, "date": t.date.isoformat(), "category": t.category, "description": t.description} for t in expenses]
-    top5 = get_top_n_expenses(expenses_list, n=5)
+    return {"categories": [{"id": c.id, "name": c.name, "usage_count": c.usage_count} for c in categories]}
+
+# ---------------------- DASHBOARD ROUTES ---------------------- #
+@app.get("/api/dashboard")
+async def get_dashboard(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get dashboard data in the user's base currency"""
+    # Totals come from the per-month counters, which are kept in base currency on every write
+    totals = running_totals(db, current_user.username)
     
-    # Recent transactions
-    recent = sorted(transactions, key=lambda x: x.date, reverse=True)[:10]
-    recent_list = [{
-        "id": t.id,
-        "date": t.date.isoformat(),
-        "kind": t.kind.value,
-        "category": t.category,
-        "amount": t.amount,
-        "description": t.description
-    } for t in recent]
+    recent = active_transactions(db, current_user.username).order_by(
+        Transaction.date.desc(), Transaction.id.desc()
+    ).limit(10).all()
     
     return {
-        "total_income": total_income,
-        "total_expense": total_expense,
-        "net_balance": net_balance,
-        "this_month_expense": this_month_exp,
-        "this_month_income": this_month_inc,
-        "this_month_net": this_month_net,
-        "top5_expenses": top5,
-        "recent_transactions": recent_list,
+        **totals,
+        "top5_expenses": top_expenses(db, current_user),
+        "recent_transactions": [transaction_to_dict(t) for t in recent],
         "monthly_budget": current_user.monthly_budget,
-        "savings_goal": current_user.savings_goal
+        "savings_goal": current_user.savings_goal,
+        "base_currency": current_user.base_currency
     }
 
 # ---------------------- ANALYTICS ROUTES ---------------------- #
@@ -474,32 +797,41 @@ async def get_analytics(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get analytics data"""
-    transactions = db.query(Transaction).filter(
-        Transaction.username == current_user.username
-    ).all()
+    """Get analytics data in the user's base currency"""
+    import numpy as np  # lazy: only analytics needs NumPy, keep it out of worker startup
     
-    expenses = [t for t in transactions if t.kind == TransactionKind.expense]
-    incomes = [t for t in transactions if t.kind == TransactionKind.income]
+    # One row per category, kind, currency and day, converted in a single vectorized pass
+    groups = active_transactions(db, current_user.username).with_entities(
+        Transaction.category_id, Transaction.kind, Transaction.currency, Transaction.date, func.sum(Transaction.amount)
+    ).group_by(Transaction.category_id, Transaction.kind, Transaction.currency, Transaction.date).all()
     
-    # Category-wise expense breakdown
-    category_data = {}
-    for exp in expenses:
-        if exp.category not in category_data:
-            category_data[exp.category] = 0.0
-        category_data[exp.category] += exp.amount
+    if current_user.archived_through:
+        # Archived years come from their monthly rollups (converted at the month's first-day rate)
+        groups += db.query(
+            ArchiveSummary.category_id, ArchiveSummary.kind, ArchiveSummary.currency, ArchiveSummary.month, ArchiveSummary.total
+        ).filter(ArchiveSummary.username == current_user.username).all()
     
-    # Monthly trends
+    category_data = {}
     monthly_data = {}
-    for t in transactions:
-        month_start = datetime(t.date.year, t.date.month, 1)
-        month_key = month_start.isoformat()
-        if month_key not in monthly_data:
-            monthly_data[month_key] = {"expense": 0.0, "income": 0.0}
-        if t.kind == TransactionKind.expense:
-            monthly_data[month_key]["expense"] += t.amount
-        else:
-            monthly_data[month_key]["income"] += t.amount
+    if groups:
+        category_ids, kinds, currencies, dates, amounts = zip(*groups)
+        amounts = convert(db, amounts, currencies, dates, current_user.base_currency)
+        is_expense = np.array([kind == TransactionKind.expense for kind in kinds])
+        
+        # Category-wise expense breakdown, summed per integer category id
+        category_names = dict(db.query(Category.id, Category.name).filter(Category.username == current_user.username).all())
+        ids = np.array([category_id if category_id is not None else -1 for category_id in category_ids])
+        unique_ids, inverse = np.unique(ids[is_expense], return_inverse=True)
+        for category_id, total in zip(unique_ids.tolist(), np.bincount(inverse, weights=amounts[is_expense]).tolist()):
+            category_data[category_names.get(category_id, "Uncategorized")] = total
+        
+        # Monthly trends
+        months = np.array([datetime(d.year, d.month, 1).isoformat() for d in dates])
+        unique_months, inverse = np.unique(months, return_inverse=True)
+        expense_totals = np.bincount(inverse, weights=np.where(is_expense, amounts, 0.0), minlength=len(unique_months))
+        income_totals = np.bincount(inverse, weights=np.where(is_expense, 0.0, amounts), minlength=len(unique_months))
+        for month_key, expense, income in zip(unique_months.tolist(), expense_totals.tolist(), income_totals.tolist()):
+            monthly_data[month_key] = {"expense": expense, "income": income}
     
     # Forecast (simple linear trend)
     forecast = None
@@ -515,7 +847,38 @@ async def get_analytics(
     return {
         "category_breakdown": category_data,
         "monthly_trends": monthly_data,
-        "forecast": forecast
+        "forecast": forecast,
+        "base_currency": current_user.base_currency
+    }
+
+@app.get("/api/analytics/balance")
+async def get_balance_series(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    resolution: str = "day",
+    max_points: int = 366,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get running balance per day/week/month from the daily balance index"""
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail="Resolution must be day, week or month")
+    
+    if max_points < 1:
+        raise HTTPException(status_code=400, detail="max_points must be at least 1")
+    
+    end_date = end_date or date.today()
+    start_date = start_date or first_activity(db, current_user.username) or end_date
+    
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="End date must be on or after start date")
+    
+    return {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "resolution": resolution,
+        "opening_balance": balance_on(db, current_user.username, start_date - timedelta(days=1)),
+        "series": balance_series(db, current_user.username, start_date, end_date, resolution, max_points)
     }
 
 # ---------------------- SEARCH ROUTES ---------------------- #
@@ -526,9 +889,7 @@ async def get_search_suggestions(
     db: Session = Depends(get_db)
 ):
     """Get search suggestions using Trie"""
-    transactions = db.query(Transaction).filter(
-        Transaction.username == current_user.username
-    ).all()
+    transactions = active_transactions(db, current_user.username).all()
     
     # Build Trie from descriptions
     trie = Trie()
@@ -552,6 +913,7 @@ async def update_budget(
 ):
     """Update monthly budget"""
     current_user.monthly_budget = budget.monthly_budget
+    reevaluate_month(db, current_user, month_start(date.today()))
     db.commit()
     return {"message": "Budget updated successfully", "monthly_budget": current_user.monthly_budget}
 
@@ -563,6 +925,7 @@ async def update_savings_goal(
 ):
     """Update savings goal"""
     current_user.savings_goal = goal.savings_goal
+    reevaluate_month(db, current_user, month_start(date.today()))
     db.commit()
     return {"message": "Savings goal updated successfully", "savings_goal": current_user.savings_goal}
 
@@ -572,21 +935,157 @@ async def get_profile_stats(
     db: Session = Depends(get_db)
 ):
     """Get user profile statistics"""
-    transactions = db.query(Transaction).filter(
-        Transaction.username == current_user.username
-    ).all()
+    totals = running_totals(db, current_user.username)
     
-    total_amount = sum(t.amount for t in transactions)
-    count = len(transactions)
+    total_amount = totals["total_income"] + totals["total_expense"]
+    count = active_transactions(db, current_user.username).count()
+    if current_user.archived_through:
+        count += db.query(func.sum(ArchiveSummary.count)).filter(
+            ArchiveSummary.username == current_user.username
+        ).scalar() or 0
     
     return {
         "username": current_user.username,
         "total_transactions": count,
         "total_amount": total_amount,
         "monthly_budget": current_user.monthly_budget,
-        "savings_goal": current_user.savings_goal
+        "savings_goal": current_user.savings_goal,
+        "base_currency": current_user.base_currency
     }
 
+@app.put("/api/profile/currency")
+async def update_base_currency(
+    currency_data: BaseCurrencyUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Change the base currency; targets are converted at today's rate and aggregates rebuilt"""
+    currency = currency_for_write(db, currency_data.base_currency, current_user.base_currency)
+    
+    # Lock the user's row (the lock every transaction write takes first) so no write lands
+    # between the switch and the rebuilds; re-read, as another request may have switched already
+    db.refresh(current_user, with_for_update=True)
+    old_currency = current_user.base_currency
+    
+    if currency != old_currency:
+        today = date.today()
+        current_user.monthly_budget = convert_one(db, current_user.monthly_budget, old_currency, today, currency)
+        current_user.savings_goal = convert_one(db, current_user.savings_goal, old_currency, today, currency)
+        for budget in db.query(CategoryBudget).filter(CategoryBudget.username == current_user.username):
+            budget.monthly_limit = convert_one(db, budget.monthly_limit, old_currency, today, currency)
+        current_user.base_currency = currency
+        db.flush()  # the rebuilds read the new base currency
+        
+        # Counters, daily nets and stored base amounts hold base-currency amounts; recompute them
+        # in the same transaction, so a failure leaves the old currency and aggregates intact
+        rebuild_counters(db, current_user.username, commit=False)
+        rebuild_daily_balances(db, current_user.username, commit=False)
+        rebuild_base_amounts(db, current_user.username, commit=False)
+        reevaluate_month(db, current_user, month_start(today))
+        db.commit()
+    
+    return {"message": "Base currency updated successfully", "base_currency": current_user.base_currency}
+
+# ---------------------- BUDGET ROUTES ---------------------- #
+@app.get("/api/budget/status")
+async def get_budget_status(
+    month: Optional[date] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get month-to-date progress against budgets and savings goal"""
+    return month_status(db, current_user, month_start(month or date.today()))
+
+@app.get("/api/budget/events")
+async def get_budget_events(
+    after: int = 0,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Poll threshold-crossing events newer than the given event id"""
+    events = db.query(BudgetEvent).filter(
+        and_(
+            BudgetEvent.username == current_user.username,
+            BudgetEvent.id > after
+        )
+    ).order_by(BudgetEvent.id).limit(100).all()
+    
+    return {"events": [budget_event_to_dict(e) for e in events]}
+
+@app.get("/api/budget/categories")
+async def get_category_budgets(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get per-category monthly budgets"""
+    budgets = db.query(CategoryBudget).filter(
+        CategoryBudget.username == current_user.username
+    ).order_by(CategoryBudget.category).all()
+    
+    return {"categories": [{"category": b.category, "monthly_limit": b.monthly_limit} for b in budgets]}
+
+@app.put("/api/budget/categories")
+async def update_category_budget(
+    budget: CategoryBudgetUpdate,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create or update a per-category monthly budget"""
+    if budget.monthly_limit <= 0:
+        raise HTTPException(status_code=400, detail="Monthly limit must be greater than 0")
+    
+    category = category_for_write(db, current_user.username, budget.category)
+    existing = db.query(CategoryBudget).filter(
+        and_(
+            CategoryBudget.username == current_user.username,
+            CategoryBudget.category == category.name
+        )
+    ).first()
+    
+    if existing:
+        existing.monthly_limit = budget.monthly_limit
+    else:
+        db.add(CategoryBudget(
+            username=current_user.username,
+            category=category.name,
+            monthly_limit=budget.monthly_limit
+        ))
+    db.flush()
+    reevaluate_month(db, current_user, month_start(date.today()))
+    db.commit()
+    
+    return {"message": "Category budget updated successfully", "category": category.name, "monthly_limit": budget.monthly_limit}
+
+@app.delete("/api/budget/categories/{category}")
+async def delete_category_budget(
+    category: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a per-category monthly budget"""
+    category_row = find_category(db, current_user.username, category)
+    deleted = category_row and db.query(CategoryBudget).filter(
+        and_(
+            CategoryBudget.username == current_user.username,
+            CategoryBudget.category == category_row.name
+        )
+    ).delete(synchronize_session=False)
+    
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Category budget not found")
+    
+    db.commit()
+    return {"message": "Category budget deleted successfully"}
+
+# ---------------------- CURRENCY ROUTES ---------------------- #
+@app.get("/api/fx/currencies")
+async def get_currencies(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get currencies that have FX rates loaded"""
+    return {"base_currency": current_user.base_currency, "currencies": rate_cache.currencies(db)}
+
 # ---------------------- REPORT ROUTES ---------------------- #
 @app.get("/api/reports/pdf")
 async def download_pdf_report(
@@ -596,24 +1095,9 @@ async def download_pdf_report(
     db: Session = Depends(get_db)
 ):
     """Download PDF report"""
-    query = db.query(Transaction).filter(Transaction.username == current_user.username)
-    
-    if start_date:
-        query = query.filter(Transaction.date >= start_date)
-    if end_date:
-        query = query.filter(Transaction.date <= end_date)
-    
-    transactions = query.order_by(Transaction.date).all()
-    
-    transactions_list = [{
-        "date": t.date.isoformat(),
-        "category": t.category,
-        "amount": t.amount,
-        "description": t.description,
-        "kind": t.kind.value
-    } for t in transactions]
+    transactions_list = report_rows(db, current_user, start_date, end_date)
     
-    pdf_bytes = generate_pdf_report(transactions_list, current_user.username)
+    pdf_bytes = generate_pdf_report(transactions_list, current_user.username, current_user.base_currency)
     
     return StreamingResponse(
         iter([pdf_bytes]),
@@ -629,24 +1113,9 @@ async def download_csv_report(
     db: Session = Depends(get_db)
 ):
     """Download CSV report"""
-    query = db.query(Transaction).filter(Transaction.username == current_user.username)
+    transactions_list = report_rows(db, current_user, start_date, end_date)
     
-    if start_date:
-        query = query.filter(Transaction.date >= start_date)
-    if end_date:
-        query = query.filter(Transaction.date <= end_date)
-    
-    transactions = query.order_by(Transaction.date).all()
-    
-    transactions_list = [{
-        "date": t.date.isoformat(),
-        "category": t.category,
-        "amount": t.amount,
-        "description": t.description,
-        "kind": t.kind.value
-    } for t in transactions]
-    
-    csv_bytes = generate_csv_report(transactions_list)
+    csv_bytes = generate_csv_report(transactions_list, current_user.base_currency)
     
     return StreamingResponse(
         iter([csv_bytes]),
@@ -662,24 +1131,9 @@ async def download_excel_report(
     db: Session = Depends(get_db)
 ):
     """Download Excel report"""
-    query = db.query(Transaction).filter(Transaction.username == current_user.username)
-    
-    if start_date:
-        query = query.filter(Transaction.date >= start_date)
-    if end_date:
-        query = query.filter(Transaction.date <= end_date)
+    transactions_list = report_rows(db, current_user, start_date, end_date)
     
-    transactions = query.order_by(Transaction.date).all()
-    
-    transactions_list = [{
-        "date": t.date.isoformat(),
-        "category": t.category,
-        "amount": t.amount,
-        "description": t.description,
-        "kind": t.kind.value
-    } for t in transactions]
-    
-    excel_bytes = generate_excel_report(transactions_list, current_user.username)
+    excel_bytes = generate_excel_report(transactions_list, current_user.username, current_user.base_currency)
     
     return StreamingResponse(
         iter([excel_bytes]),
@@ -687,5 +1141,67 @@ async def download_excel_report(
         headers={"Content-Disposition": f"attachment; filename=expense_report_{current_user.username}.xlsx"}
     )
 
+@app.get("/api/reports/parquet")
+async def download_parquet_report(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download Parquet export, streamed in record batches"""
+    statements = [export_statement(query, model) for model, query in transaction_history(db, current_user, start_date, end_date)]
+    
+    return StreamingResponse(
+        stream_export(statements, "parquet"),
+        media_type="application/vnd.apache.parquet",
+        headers={"Content-Disposition": f"attachment; filename=transactions_{current_user.username}.parquet"}
+    )
+
+@app.get("/api/reports/arrow")
+async def download_arrow_report(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download Arrow IPC export, streamed in record batches"""
+    statements = [export_statement(query, model) for model, query in transaction_history(db, current_user, start_date, end_date)]
+    
+    return StreamingResponse(
+        stream_export(statements, "arrow"),
+        media_type="application/vnd.apache.arrow.file",
+        headers={"Content-Disposition": f"attachment; filename=transactions_{current_user.username}.arrow"}
+    )
+
+# ---------------------- IMPORT ROUTES ---------------------- #
+@app.post("/api/transactions/import")
+async def import_transactions(
+    file: UploadFile,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Import a Parquet or Arrow file in the export format (appends; ids in the file are ignored)"""
+    try:
+        imported, duplicates = import_file(db, current_user.username, current_user.base_currency, file.file)
+    except UnknownCurrency as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"No FX rates loaded for currency {e}")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Could not import file: {e}")
+    db.commit()
+    
+    if imported:
+        await publish_change(db, current_user, "transactions.imported", {"count": imported})
+    
+    skipped = duplicates if DUPLICATE_POLICY == "reject" else 0
+    return {
+        "imported": imported,
+        "duplicates": duplicates,
+        "skipped": skipped,
+        "message": f"Imported {imported} transaction(s)" + (f", skipped {skipped} duplicate(s)" if skipped else "")
+    }
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=3000)
+    from run import serve
+    serve()
@@ -0,0 +1,236 @@
+"""
+Database migration script
+Run to bring an existing database up to the current schema.
+Every step is idempotent, so it is safe to run more than once.
+"""
+from sqlalchemy import inspect, text
+from database import engine, Base
+import models  # noqa: F401 (registers all tables on Base)
+import sys
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(engine).get_columns(table)}
+
+def _has_index(table: str, index: str) -> bool:
+    return index in {i["name"] for i in inspect(engine).get_indexes(table)}
+
+def add_transaction_tombstones():
+    """Soft-delete column and the index used to exclude tombstoned rows"""
+    with engine.begin() as conn:
+        if not _has_column("transactions", "deleted_at"):
+            conn.execute(text("ALTER TABLE transactions ADD COLUMN deleted_at DATETIME NULL"))
+        if not _has_index("transactions", "ix_transactions_username_deleted_date"):
+            conn.execute(text(
+                "CREATE INDEX ix_transactions_username_deleted_date "
+                "ON transactions (username, deleted_at, date)"
+            ))
+
+def add_recurring_rule_link():
+    """Link materialized transactions to their recurring rule, one occurrence per date"""
+    with engine.begin() as conn:
+        if not _has_column("transactions", "recurring_rule_id"):
+            conn.execute(text("ALTER TABLE transactions ADD COLUMN recurring_rule_id INTEGER NULL"))
+        if not _has_index("transactions", "uq_transactions_rule_date"):
+            conn.execute(text(
+                "CREATE UNIQUE INDEX uq_transactions_rule_date "
+                "ON transactions (recurring_rule_id, date)"
+            ))
+
+def backfill_spend_counters():
+    """Seed month-to-date budget counters from existing transactions"""
+    from database import SessionLocal
+    from models import SpendCounter
+    from budgets import rebuild_counters
+
+    db = SessionLocal()
+    try:
+        if db.query(SpendCounter.id).first() is None:
+            rebuild_counters(db)
+    finally:
+        db.close()
+
+def add_category_ids():
+    """Dictionary-encode categories and backfill ids from the existing strings"""
+    from database import SessionLocal
+    from categories import backfill_categories
+    from budgets import rebuild_counters
+
+    with engine.begin() as conn:
+        for table in ("transactions", "recurring_rules"):
+            if not _has_column(table, "category_id"):
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN category_id INTEGER NULL"))
+        if not _has_index("transactions", "ix_transactions_username_category_date"):
+            conn.execute(text(
+                "CREATE INDEX ix_transactions_username_category_date "
+                "ON transactions (username, category_id, date)"
+            ))
+
+    db = SessionLocal()
+    try:
+        # Counters are keyed by category name, which backfilling may have canonicalized
+        if backfill_categories(db):
+            rebuild_counters(db)
+    finally:
+        db.close()
+
+def backfill_daily_balances():
+    """Seed the running-balance index from existing transactions"""
+    from database import SessionLocal
+    from models import DailyBalance
+    from balances import rebuild_daily_balances
+
+    db = SessionLocal()
+    try:
+        if db.query(DailyBalance.id).first() is None:
+            rebuild_daily_balances(db)
+    finally:
+        db.close()
+
+def add_currencies():
+    """Per-transaction currency and per-user base currency; existing amounts are in BASE_CURRENCY"""
+    from config import BASE_CURRENCY
+
+    with engine.begin() as conn:
+        for table in ("transactions", "recurring_rules"):
+            if not _has_column(table, "currency"):
+                conn.execute(text(
+                    f"ALTER TABLE {table} ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT '{BASE_CURRENCY}'"
+                ))
+        if not _has_column("users", "base_currency"):
+            conn.execute(text(
+                f"ALTER TABLE users ADD COLUMN base_currency VARCHAR(3) NOT NULL DEFAULT '{BASE_CURRENCY}'"
+            ))
+
+def add_archive_horizon():
+    """Per-user boundary of archived history (archive tables themselves come from create_all)"""
+    with engine.begin() as conn:
+        if not _has_column("users", "archived_through"):
+            conn.execute(text("ALTER TABLE users ADD COLUMN archived_through DATE NULL"))
+
+def add_change_sequence():
+    """Per-user change sequence for delta sync, backfilled in id order for existing rows"""
+    from sqlalchemy import update
+    from database import SessionLocal
+    from models import User, Transaction, ArchivedTransaction
+
+    with engine.begin() as conn:
+        for table in ("transactions", "archived_transactions"):
+            if not _has_column(table, "change_seq"):
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0"))
+            if not _has_index(table, f"ix_{table}_username_change_seq"):
+                conn.execute(text(f"CREATE INDEX ix_{table}_username_change_seq ON {table} (username, change_seq)"))
+        for column in ("change_seq", "purged_seq"):
+            if not _has_column("users", column):
+                conn.execute(text(f"ALTER TABLE users ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"))
+
+    db = SessionLocal()
+    try:
+        # Only users that were never stamped: every row still at 0
+        for user in db.query(User).filter(User.change_seq == 0).all():
+            seq = 0
+            for model in (ArchivedTransaction, Transaction):
+                ids = [row.id for row in db.query(model.id).filter(model.username == user.username).order_by(model.id)]
+                if ids:
+                    db.execute(update(model), [{"id": row_id, "change_seq": seq + i + 1} for i, row_id in enumerate(ids)])
+                    seq += len(ids)
+            user.change_seq = seq
+            db.commit()
+    finally:
+        db.close()
+
+def add_fingerprints():
+    """Duplicate detection fingerprint and its index on both tables, backfilled for existing rows"""
+    from sqlalchemy import update
+    from database import SessionLocal
+    from models import Transaction, ArchivedTransaction
+    from duplicates import FINGERPRINT_FIELDS, row_fingerprint
+
+    with engine.begin() as conn:
+        for table in ("transactions", "archived_transactions"):
+            if not _has_column(table, "fingerprint"):
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN fingerprint VARCHAR(32) NULL"))
+            if not _has_index(table, f"ix_{table}_username_fingerprint_date"):
+                conn.execute(text(
+                    f"CREATE INDEX ix_{table}_username_fingerprint_date "
+                    f"ON {table} (username, fingerprint, date)"
+                ))
+
+    db = SessionLocal()
+    try:
+        for model in (Transaction, ArchivedTransaction):
+            while True:
+                batch = db.query(model.id, *[getattr(model, f) for f in FINGERPRINT_FIELDS]).filter(
+                    model.fingerprint.is_(None)
+                ).order_by(model.id).limit(1000).all()
+                if not batch:
+                    break
+                db.execute(update(model), [{"id": row.id, "fingerprint": row_fingerprint(row)} for row in batch])
+                db.commit()
+    finally:
+        db.close()
+
+def add_base_amounts():
+    """Stored base-currency amount behind the top expenses query, backfilled for existing rows"""
+    from database import SessionLocal
+    from fx import rebuild_base_amounts
+    from models import Transaction
+
+    with engine.begin() as conn:
+        if not _has_column("transactions", "amount_base"):
+            conn.execute(text("ALTER TABLE transactions ADD COLUMN amount_base FLOAT NULL"))
+        if not _has_index("transactions", "ix_transactions_username_kind_amount_base"):
+            conn.execute(text(
+                "CREATE INDEX ix_transactions_username_kind_amount_base "
+                "ON transactions (username, kind, amount_base)"
+            ))
+
+    db = SessionLocal()
+    try:
+        if db.query(Transaction.id).filter(Transaction.amount_base.is_(None)).first() is not None:
+            rebuild_base_amounts(db)
+    finally:
+        db.close()
+
+def backfill_monthly_balances():
+    """Seed the per-month nets behind balance lookups (rebuilt together with the daily nets)"""
+    from database import SessionLocal
+    from models import DailyBalance, MonthlyBalance
+    from balances import rebuild_daily_balances
+
+    db = SessionLocal()
+    try:
+        if db.query(MonthlyBalance.id).first() is None and db.query(DailyBalance.id).first() is not None:
+            rebuild_daily_balances(db)
+    finally:
+        db.close()
+
+MIGRATIONS = [
+    add_transaction_tombstones,
+    add_recurring_rule_link,
+    add_currencies,  # before any backfill, which reads transactions.currency
+    add_archive_horizon,
+    add_change_sequence,
+    backfill_spend_counters,
+    add_category_ids,
+    add_fingerprints,  # after category ids, which are part of the fingerprint
+    add_base_amounts,
+    backfill_daily_balances,
+    backfill_monthly_balances,
+]
+
+def migrate_database():
+    try:
+        print("Creating missing tables...")
+        Base.metadata.create_all(bind=engine)
+        for step in MIGRATIONS:
+            print(f"Applying {step.__name__}...")
+            step()
+        print("✅ Database migrated successfully!")
+        return True
+    except Exception as e:
+        print(f"❌ Error migrating database: {e}")
+        return False
+
+if __name__ == "__main__":
+    success = migrate_database()
+    sys.exit(0 if success else 1)
@@ -1,11 +1,17 @@
-from sqlalchemy import Column, Integer, String, Float, Date, Enum
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Enum, Index, UniqueConstraint
 from database import Base
+from config import BASE_CURRENCY
 import enum
 
 class TransactionKind(enum.Enum):
     expense = "expense"
     income = "income"
 
+class RecurrenceFrequency(enum.Enum):
+    daily = "daily"
+    weekly = "weekly"
+    monthly = "monthly"
+
 class User(Base):
     __tablename__ = "users"
     
@@ -16,6 +22,18 @@ class User(Base):
     sec_answer_hash = Column(String(255), nullable=True)
     savings_goal = Column(Float, default=0.0)
     monthly_budget = Column(Float, default=0.0)
+    base_currency = Column(String(3), nullable=False, default=BASE_CURRENCY)  # dashboards and reports convert into this
+    archived_through = Column(Date, nullable=True)  # last day moved to archived_transactions; NULL if none
+    change_seq = Column(Integer, nullable=False, default=0)  # last transaction change sequence handed out
+    purged_seq = Column(Integer, nullable=False, default=0)  # highest change_seq of a hard-deleted tombstone
+
+class UserSession(Base):
+    """Active login, shared by all workers when SESSION_BACKEND=database"""
+    __tablename__ = "user_sessions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(100), unique=True, nullable=False)
+    created_at = Column(DateTime, nullable=False)
 
 class Transaction(Base):
     __tablename__ = "transactions"
@@ -23,7 +41,182 @@ class Transaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(100), nullable=False, index=True)
     date = Column(Date, nullable=False)
+    category = Column(String(100), nullable=False)  # canonical name of category_id
+    category_id = Column(Integer, nullable=True)
+    amount = Column(Float, nullable=False)
+    currency = Column(String(3), nullable=False, default=BASE_CURRENCY)
+    amount_base = Column(Float, nullable=True)  # amount in the user's base currency, kept for ranking
+    description = Column(String(500), nullable=True)
+    kind = Column(Enum(TransactionKind), nullable=False, default=TransactionKind.expense)
+    deleted_at = Column(DateTime, nullable=True)  # tombstone for undoable deletes
+    recurring_rule_id = Column(Integer, nullable=True)  # set when materialized from a rule
+    change_seq = Column(Integer, nullable=False, default=0)  # per-user sequence of the last insert/update/delete
+    fingerprint = Column(String(32), nullable=True)  # duplicate detection key, see duplicates.py
+
+    __table_args__ = (
+        Index("ix_transactions_username_deleted_date", "username", "deleted_at", "date"),
+        Index("ix_transactions_username_category_date", "username", "category_id", "date"),
+        Index("ix_transactions_username_change_seq", "username", "change_seq"),
+        Index("ix_transactions_username_fingerprint_date", "username", "fingerprint", "date"),
+        Index("ix_transactions_username_kind_amount_base", "username", "kind", "amount_base"),
+        # One occurrence per rule and date keeps materialization idempotent
+        UniqueConstraint("recurring_rule_id", "date", name="uq_transactions_rule_date"),
+        # SQLite would otherwise reuse the ids of archived rows; see archive.reserve_archived_ids
+        {"sqlite_autoincrement": True},
+    )
+
+class ArchivedTransaction(Base):
+    """Live transactions of closed years moved out of the hot table (same ids, read-only)"""
+    __tablename__ = "archived_transactions"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    username = Column(String(100), nullable=False)
+    date = Column(Date, nullable=False)
+    category = Column(String(100), nullable=False)
+    category_id = Column(Integer, nullable=True)
+    amount = Column(Float, nullable=False)
+    currency = Column(String(3), nullable=False, default=BASE_CURRENCY)
+    description = Column(String(500), nullable=True)
+    kind = Column(Enum(TransactionKind), nullable=False)
+    recurring_rule_id = Column(Integer, nullable=True)
+    change_seq = Column(Integer, nullable=False, default=0)
+    fingerprint = Column(String(32), nullable=True)
+
+    __table_args__ = (
+        Index("ix_archived_transactions_username_date", "username", "date"),
+        Index("ix_archived_transactions_username_category_date", "username", "category_id", "date"),
+        Index("ix_archived_transactions_username_change_seq", "username", "change_seq"),
+        Index("ix_archived_transactions_username_fingerprint_date", "username", "fingerprint", "date"),
+    )
+
+class ArchiveSummary(Base):
+    """Per-month rollup of archived transactions, so analytics never scans the archive"""
+    __tablename__ = "archive_summaries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(100), nullable=False)
+    month = Column(Date, nullable=False)  # first day of the month
+    category_id = Column(Integer, nullable=True)
+    kind = Column(Enum(TransactionKind), nullable=False)
+    currency = Column(String(3), nullable=False)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("username", "month", "category_id", "kind", "currency", name="uq_archive_summaries_key"),
+    )
+
+class Category(Base):
+    """Per-user dictionary of categories; key is the normalized (case-folded) name"""
+    __tablename__ = "categories"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(100), nullable=False)
+    key = Column(String(100), nullable=False)
+    name = Column(String(100), nullable=False)
+    usage_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("username", "key", name="uq_categories_username_key"),
+    )
+
+class RecurringRule(Base):
+    __tablename__ = "recurring_rules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(100), nullable=False, index=True)
     category = Column(String(100), nullable=False)
+    category_id = Column(Integer, nullable=True)
     amount = Column(Float, nullable=False)
+    currency = Column(String(3), nullable=False, default=BASE_CURRENCY)
     description = Column(String(500), nullable=True)
     kind = Column(Enum(TransactionKind), nullable=False, default=TransactionKind.expense)
+    frequency = Column(Enum(RecurrenceFrequency), nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=True)
+    next_date = Column(Date, nullable=True, index=True)  # next occurrence to materialize; NULL when finished
+
+class FxRate(Base):
+    """Value of one unit of currency in BASE_CURRENCY, effective from date until the next rate"""
+    __tablename__ = "fx_rates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String(3), nullable=False)
+    date = Column(Date, nullable=False)
+    rate = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("currency", "date", name="uq_fx_rates_currency_date"),
+    )
+
+class SpendCounter(Base):
+    """Running month-to-date total per user, kind and category ("" = all categories), in the user's base currency"""
+    __tablename__ = "spend_counters"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(100), nullable=False)
+    month = Column(Date, nullable=False)  # first day of the month
+    kind = Column(Enum(TransactionKind), nullable=False)
+    category = Column(String(100), nullable=False, default="")
+    total = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("username", "month", "kind", "category", name="uq_spend_counters_key"),
+    )
+
+class DailyBalance(Base):
+    """Net amount (income - expense) per user and day in base currency; prefix sums give the running balance"""
+    __tablename__ = "daily_balances"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(100), nullable=False)
+    date = Column(Date, nullable=False)
+    net = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("username", "date", name="uq_daily_balances_username_date"),
+    )
+
+class MonthlyBalance(Base):
+    """Net amount per user and month (sum of its daily_balances rows), so a balance needs at most months + 31 rows"""
+    __tablename__ = "monthly_balances"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(100), nullable=False)
+    month = Column(Date, nullable=False)  # first day of the month
+    net = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("username", "month", name="uq_monthly_balances_username_month"),
+    )
+
+class CategoryBudget(Base):
+    __tablename__ = "category_budgets"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(100), nullable=False)
+    category = Column(String(100), nullable=False)
+    monthly_limit = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("username", "category", name="uq_category_budgets_key"),
+    )
+
+class BudgetEvent(Base):
+    """Threshold crossing (50/80/100%) of a budget or savings goal, emitted once per month"""
+    __tablename__ = "budget_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String(100), nullable=False)
+    month = Column(Date, nullable=False)
+    scope = Column(String(20), nullable=False)  # "budget", "category" or "savings"
+    category = Column(String(100), nullable=False, default="")
+    threshold = Column(Integer, nullable=False)
+    amount = Column(Float, nullable=False)
+    target = Column(Float, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_budget_events_username_id", "username", "id"),
+        UniqueConstraint("username", "month", "scope", "category", "threshold", name="uq_budget_events_key"),
+    )
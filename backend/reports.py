@@ -1,13 +1,63 @@
 """
 Report generation: PDF, CSV, Excel
+pandas, FPDF and openpyxl are imported on first use so that importing this
+module (and therefore starting an API worker) does not load them.
+Each transaction carries its original amount and currency plus amount_base,
+the amount converted to the user's base currency; totals use amount_base.
 """
+from datetime import date
 from io import BytesIO
-from typing import List, Dict
-import pandas as pd
-from fpdf import FPDF
+from typing import List, Dict, Optional
 
-def generate_pdf_report(transactions: List[Dict], username: str) -> bytes:
+from sqlalchemy.orm import Session
+
+from models import User
+from archive import history_models, live_rows
+from fx import convert
+
+REPORT_BATCH_SIZE = 5000
+
+REPORT_COLUMNS = ["date", "category", "amount", "currency", "description", "kind"]
+
+def report_rows(db: Session, user: User, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                batch_size: int = REPORT_BATCH_SIZE) -> List[Dict]:
+    """
+    Report rows for a user and date range, oldest first, with amount_base in the user's base
+    currency. Rows are fetched through a server-side cursor in batches and each batch is
+    converted in one vectorized pass; the archive is read only when the range reaches it.
+    """
+    rows = []
+    for model in history_models(user, start_date):
+        query = live_rows(db, model, *REPORT_COLUMNS).filter(model.username == user.username)
+        if start_date:
+            query = query.filter(model.date >= start_date)
+        if end_date:
+            query = query.filter(model.date <= end_date)
+
+        result = db.execute(query.order_by(model.date, model.id).statement.execution_options(yield_per=batch_size))
+        for batch in result.partitions():
+            dates, categories, amounts, currencies, descriptions, kinds = zip(*batch)
+            base_amounts = convert(db, amounts, currencies, dates, user.base_currency).tolist()
+            rows += [{
+                "date": d.isoformat(),
+                "category": category,
+                "amount": amount,
+                "currency": currency,
+                "amount_base": amount_base,
+                "description": description,
+                "kind": kind.value
+            } for d, category, amount, currency, amount_base, description, kind in zip(
+                dates, categories, amounts, currencies, base_amounts, descriptions, kinds
+            )]
+
+    # Merge the hot and archive tables (the hot table may also hold back-dated rows)
+    rows.sort(key=lambda r: r["date"])
+    return rows
+
+def generate_pdf_report(transactions: List[Dict], username: str, base_currency: str) -> bytes:
     """Generate PDF report from transactions"""
+    from fpdf import FPDF
+
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
@@ -17,69 +67,79 @@ def generate_pdf_report(transactions: List[Dict], username: str) -> bytes:
     pdf.ln(4)
 
     pdf.set_font("Arial", "", 11)
-    total = sum(t["amount"] for t in transactions)
-    pdf.cell(0, 8, f"Total Transactions Amount: Rs. {total:.2f}", ln=True)
+    total = sum(t["amount_base"] for t in transactions)
+    pdf.cell(0, 8, f"Total Transactions Amount: {base_currency} {total:.2f}", ln=True)
     pdf.ln(4)
 
     pdf.set_font("Arial", "B", 11)
     pdf.cell(22, 8, "Date", border=1)
-    pdf.cell(25, 8, "Type", border=1)
-    pdf.cell(30, 8, "Category", border=1)
-    pdf.cell(30, 8, "Amount", border=1)
-    pdf.cell(83, 8, "Description", border=1, ln=True)
+    pdf.cell(20, 8, "Type", border=1)
+    pdf.cell(28, 8, "Category", border=1)
+    pdf.cell(32, 8, "Amount", border=1)
+    pdf.cell(30, 8, f"Amount ({base_currency})", border=1)
+    pdf.cell(58, 8, "Description", border=1, ln=True)
 
     pdf.set_font("Arial", "", 10)
 
     for t in transactions:
         kind_label = "Income" if t["kind"] == "income" else "Expense"
-        date_str = pd.to_datetime(t["date"]).strftime("%d-%m-%Y") if t.get("date") else "N/A"
+        date_str = date.fromisoformat(t["date"]).strftime("%d-%m-%Y") if t.get("date") else "N/A"
         pdf.cell(22, 8, date_str, border=1)
-        pdf.cell(25, 8, kind_label[:10], border=1)
-        pdf.cell(30, 8, str(t["category"])[:12], border=1)
-        pdf.cell(30, 8, f"{t['amount']:.2f}", border=1)
+        pdf.cell(20, 8, kind_label[:10], border=1)
+        pdf.cell(28, 8, str(t["category"])[:12], border=1)
+        pdf.cell(32, 8, f"{t['amount']:.2f} {t['currency']}", border=1)
+        pdf.cell(30, 8, f"{t['amount_base']:.2f}", border=1)
         desc = str(t.get("description", ""))
-        if len(desc) > 40:
-            desc = desc[:37] + "..."
-        pdf.cell(83, 8, desc, border=1, ln=True)
+        if len(desc) > 28:
+            desc = desc[:25] + "..."
+        pdf.cell(58, 8, desc, border=1, ln=True)
 
     return bytes(pdf.output(dest="S").encode("latin-1"))
 
-def generate_csv_report(transactions: List[Dict]) -> bytes:
+def generate_csv_report(transactions: List[Dict], base_currency: str) -> bytes:
     """Generate CSV report from transactions"""
     if not transactions:
         return b""
     
+    import pandas as pd
+    
     df = pd.DataFrame(transactions)
     df["date"] = pd.to_datetime(df["date"], errors="coerce")
     df["Type"] = df["kind"].map({"income": "Income", "expense": "Expense"})
     
     csv_df = df[[
-        "date", "Type", "category", "amount", "description"
+        "date", "Type", "category", "amount", "currency", "amount_base", "description"
     ]].rename(columns={
         "date": "Date",
         "category": "Category",
         "amount": "Amount",
+        "currency": "Currency",
+        "amount_base": f"Amount ({base_currency})",
         "description": "Description",
     })
     
     csv_df["Date"] = csv_df["Date"].dt.strftime("%d-%m-%Y")
     return csv_df.to_csv(index=False).encode("utf-8")
 
-def generate_excel_report(transactions: List[Dict], username: str) -> bytes:
+def generate_excel_report(transactions: List[Dict], username: str, base_currency: str) -> bytes:
     """Generate Excel report from transactions"""
     if not transactions:
         return b""
     
+    import pandas as pd
+    
     df = pd.DataFrame(transactions)
     df["date"] = pd.to_datetime(df["date"], errors="coerce")
     df["Type"] = df["kind"].map({"income": "Income", "expense": "Expense"})
     
     excel_df = df[[
-        "date", "Type", "category", "amount", "description"
+        "date", "Type", "category", "amount", "currency", "amount_base", "description"
     ]].rename(columns={
         "date": "Date",
         "category": "Category",
         "amount": "Amount",
+        "currency": "Currency",
+        "amount_base": f"Amount ({base_currency})",
         "description": "Description",
     })
     
@@ -1,14 +1,72 @@
 """
 Run script for FastAPI backend
+SERVER_MODE=development (default) runs one auto-reloading process.
+SERVER_MODE=production runs WEB_CONCURRENCY worker processes on uvloop/httptools.
 """
+import sys
 import uvicorn
-from config import API_HOST, API_PORT
+from uvicorn.supervisors import Multiprocess
+from config import (
+    API_HOST, API_PORT, SERVER_MODE, WEB_CONCURRENCY, KEEP_ALIVE_SECONDS, BACKLOG,
+    GRACEFUL_SHUTDOWN_SECONDS, SESSION_BACKEND, EVENT_BROKER_URL
+)
 
-if __name__ == "__main__":    
-    uvicorn.run(
+class DrainingServer(uvicorn.Server):
+    """Closes live-update streams first, so graceful shutdown only waits on real requests"""
+    async def shutdown(self, sockets=None):
+        from events import close_streams
+
+        close_streams()
+        await super().shutdown(sockets=sockets)
+
+def multi_worker_problems() -> list:
+    """Per-process state that would silently diverge between workers"""
+    problems = []
+    if SESSION_BACKEND != "database":
+        problems.append("sessions are kept in worker memory (set SESSION_BACKEND=database)")
+    if not EVENT_BROKER_URL:
+        problems.append("live updates use the in-process broker (set EVENT_BROKER_URL=redis://...)")
+    return problems
+
+def serve():
+    if SERVER_MODE != "production":
+        uvicorn.run(
+            "main:app",
+            host=API_HOST,
+            port=API_PORT,
+            reload=True,
+            log_level="info"
+        )
+        return
+
+    if WEB_CONCURRENCY > 1:
+        problems = multi_worker_problems()
+        if problems:
+            print(f"❌ Refusing to start {WEB_CONCURRENCY} workers:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+
+    config = uvicorn.Config(
         "main:app",
         host=API_HOST,
         port=API_PORT,
-        reload=True,
+        workers=WEB_CONCURRENCY,
+        loop="uvloop" if sys.platform != "win32" else "asyncio",
+        http="httptools",
+        backlog=BACKLOG,
+        timeout_keep_alive=KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_SECONDS,
+        proxy_headers=True,
         log_level="info"
     )
+    server = DrainingServer(config=config)
+
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+if __name__ == "__main__":
+    serve()
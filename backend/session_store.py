@@ -0,0 +1,59 @@
+"""
+Session stores: which users currently hold a valid login
+The memory store lives in one worker process, so multi-worker servers must use
+SESSION_BACKEND=database (run.py refuses to start otherwise).
+"""
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import UserSession
+from config import SESSION_BACKEND
+
+class MemorySessionStore:
+    shared = False
+
+    def __init__(self):
+        self.sessions = {}
+
+    def add(self, username: str):
+        self.sessions[username] = {"username": username, "created_at": datetime.now()}
+
+    def exists(self, username: str) -> bool:
+        return username in self.sessions
+
+    def remove(self, username: str):
+        self.sessions.pop(username, None)
+
+class DatabaseSessionStore:
+    shared = True
+
+    def add(self, username: str):
+        db = SessionLocal()
+        try:
+            db.query(UserSession).filter(UserSession.username == username).delete()
+            db.add(UserSession(username=username, created_at=datetime.now()))
+            db.commit()
+        except IntegrityError:
+            # Another worker logged the same user in concurrently; its row is just as good
+            db.rollback()
+        finally:
+            db.close()
+
+    def exists(self, username: str) -> bool:
+        db = SessionLocal()
+        try:
+            return db.query(UserSession.id).filter(UserSession.username == username).first() is not None
+        finally:
+            db.close()
+
+    def remove(self, username: str):
+        db = SessionLocal()
+        try:
+            db.query(UserSession).filter(UserSession.username == username).delete()
+            db.commit()
+        finally:
+            db.close()
+
+session_store = DatabaseSessionStore() if SESSION_BACKEND == "database" else MemorySessionStore()
@@ -0,0 +1,136 @@
+"""
+Monthly statement generation for all users
+Generates PDF/CSV/Excel statements for one month without going through the API: users are
+split across a process pool, each user's rows are streamed with a batched cursor, and every
+file is written under a temporary name then renamed, so a crashed run resumes by skipping
+statements that already exist.
+
+Usage: python statements.py --month 2026-09 [--out statements] [--format pdf csv excel]
+                            [--username alice --username bob] [--workers 4] [--force]
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+import argparse
+import os
+import sys
+import time
+
+from models import User
+from reports import report_rows, generate_pdf_report, generate_csv_report, generate_excel_report
+
+FORMATS = {
+    "pdf": (".pdf", lambda rows, user: generate_pdf_report(rows, user.username, user.base_currency)),
+    "csv": (".csv", lambda rows, user: generate_csv_report(rows, user.base_currency)),
+    "excel": (".xlsx", lambda rows, user: generate_excel_report(rows, user.username, user.base_currency)),
+}
+
+CHUNK_SIZE = 25  # users per pool task
+
+def month_range(month: str) -> Tuple[date, date]:
+    """First and last day of a YYYY-MM month"""
+    start = date.fromisoformat(f"{month}-01")
+    next_month = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, next_month - timedelta(days=1)
+
+def statement_path(out_dir: str, month: str, username: str, fmt: str) -> str:
+    return os.path.join(out_dir, month, f"{quote(username, safe='')}{FORMATS[fmt][0]}")
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+# ---------------------- WORKER ---------------------- #
+def _init_worker():
+    # Never reuse connections inherited from the parent process
+    from database import engine
+    engine.dispose(close=False)
+
+def generate_chunk(usernames: List[str], month: str, out_dir: str, formats: List[str],
+                   force: bool = False) -> Tuple[int, int, int, int]:
+    """Write statements for a chunk of users. Returns (users, files written, rows, files skipped)"""
+    from database import SessionLocal
+
+    start, end = month_range(month)
+    users = files = rows_total = skipped = 0
+    db = SessionLocal()
+    try:
+        for username in usernames:
+            missing = [
+                fmt for fmt in formats
+                if force or not os.path.exists(statement_path(out_dir, month, username, fmt))
+            ]
+            skipped += len(formats) - len(missing)
+            if not missing:
+                continue
+
+            user = db.query(User).filter(User.username == username).first()
+            if not user:
+                continue
+            rows = report_rows(db, user, start, end)
+            for fmt in missing:
+                _write_atomic(statement_path(out_dir, month, username, fmt), FORMATS[fmt][1](rows, user))
+                files += 1
+            users += 1
+            rows_total += len(rows)
+            db.rollback()  # end the read transaction so the next user sees fresh data
+    finally:
+        db.close()
+    return users, files, rows_total, skipped
+
+# ---------------------- DRIVER ---------------------- #
+def generate_statements(month: str, out_dir: str, formats: List[str], usernames: Optional[List[str]] = None,
+                        workers: Optional[int] = None, force: bool = False) -> dict:
+    """Generate statements for every user (or the given ones) and report throughput"""
+    from database import SessionLocal
+
+    month_range(month)  # validate before starting workers
+    db = SessionLocal()
+    try:
+        query = db.query(User.username).order_by(User.username)
+        if usernames:
+            query = query.filter(User.username.in_(usernames))
+        names = [u for (u,) in query.all()]
+    finally:
+        db.close()
+
+    os.makedirs(os.path.join(out_dir, month), exist_ok=True)
+    chunks = [names[i:i + CHUNK_SIZE] for i in range(0, len(names), CHUNK_SIZE)]
+    totals = {"users": 0, "files": 0, "rows": 0, "skipped": 0}
+
+    began = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker) as pool:
+        futures = [pool.submit(generate_chunk, chunk, month, out_dir, formats, force) for chunk in chunks]
+        for done, future in enumerate(as_completed(futures), 1):
+            users, files, rows, skipped = future.result()
+            totals["users"] += users
+            totals["files"] += files
+            totals["rows"] += rows
+            totals["skipped"] += skipped
+            print(f"  {done}/{len(chunks)} chunks, {totals['files']} file(s) written", flush=True)
+    totals["seconds"] = time.perf_counter() - began
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate monthly statements for all users")
+    parser.add_argument("--month", required=True, help="YYYY-MM")
+    parser.add_argument("--out", default="statements", help="output directory")
+    parser.add_argument("--format", nargs="+", choices=list(FORMATS), default=["pdf"], dest="formats")
+    parser.add_argument("--username", action="append", dest="usernames", help="limit to these users (repeatable)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="regenerate statements that already exist")
+    args = parser.parse_args()
+
+    try:
+        totals = generate_statements(args.month, args.out, args.formats, args.usernames, args.workers, args.force)
+        elapsed = totals["seconds"] or 1e-9
+        print(f"✅ {totals['files']} statement file(s) for {totals['users']} user(s), "
+              f"{totals['rows']} transaction(s) in {elapsed:.2f}s "
+              f"({totals['users'] / elapsed:,.1f} users/s, {totals['rows'] / elapsed:,.0f} rows/s); "
+              f"{totals['skipped']} already present")
+    except Exception as e:
+        print(f"❌ Error generating statements: {e}")
+        sys.exit(1)
@@ -0,0 +1,131 @@
+"""
+Delta sync: per-user change sequence on transactions
+Every insert, update, delete (tombstone) and restore stamps the row with the user's next
+change_seq, so a client holding a local cache asks only for rows above its last seen
+value through the (username, change_seq) index. Hard-deleting tombstones raises
+users.purged_seq; a client whose cursor is below it has missed deletes and must resync.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import and_, update
+from sqlalchemy.orm import Session
+
+from models import User, Transaction, ArchivedTransaction
+
+def allocate_change_seqs(db: Session, counts: Dict[str, int]) -> Dict[str, int]:
+    """
+    Reserve counts[username] consecutive sequence numbers per user and return the first of
+    each range. The users' rows stay locked until commit, so each user's changes commit in
+    sequence order and a reader never sees seq N+1 before N. Call this before touching the
+    aggregates so every write path takes its locks in the same order.
+    """
+    users = db.query(User.id, User.username, User.change_seq).filter(
+        User.username.in_(counts)
+    ).order_by(User.id).with_for_update().all()
+
+    db.execute(update(User), [{"id": u.id, "change_seq": u.change_seq + counts[u.username]} for u in users])
+    return {u.username: u.change_seq + 1 for u in users}
+
+def stamp_change(db: Session, t: Transaction):
+    """Mark a single transaction as changed"""
+    t.change_seq = allocate_change_seqs(db, {t.username: 1})[t.username]
+
+def stamp_rows(db: Session, rows: List[dict]):
+    """Assign change_seq to a batch of new transaction rows (dicts with username)"""
+    counts = {}
+    for row in rows:
+        counts[row["username"]] = counts.get(row["username"], 0) + 1
+    next_seq = allocate_change_seqs(db, counts)
+    for row in rows:
+        row["change_seq"] = next_seq[row["username"]]
+        next_seq[row["username"]] += 1
+
+def record_purge(db: Session, purged: Iterable[Tuple[str, int]]):
+    """Raise purged_seq for users whose tombstones (username, change_seq) are being hard-deleted"""
+    highest = {}
+    for username, change_seq in purged:
+        highest[username] = max(highest.get(username, 0), change_seq)
+    if not highest:
+        return
+
+    users = db.query(User.id, User.username, User.purged_seq).filter(User.username.in_(highest)).all()
+    raised = [{"id": u.id, "purged_seq": highest[u.username]} for u in users if highest[u.username] > u.purged_seq]
+    if raised:
+        db.execute(update(User), raised)
+
+SNAPSHOT_TABLES = ["archive", "hot"]  # snapshot order; the cursor is (table, id)
+
+def _snapshot_page(db: Session, user: User, table: str, after: int, limit: int) -> Tuple[list, Tuple[str, int], bool]:
+    """
+    Live rows after the (table, id) cursor: the archive (if any) in id order, then the hot
+    table in id order. Returns the rows, the next cursor and whether more follow.
+    """
+    rows = []
+    tables = list(zip(SNAPSHOT_TABLES, [ArchivedTransaction, Transaction]))
+    for name, model in tables[SNAPSHOT_TABLES.index(table):]:
+        if model is ArchivedTransaction and not user.archived_through:
+            continue
+        query = db.query(model).filter(
+            and_(
+                model.username == user.username,
+                model.id > (after if name == table else 0)
+            )
+        )
+        if model is Transaction:
+            query = query.filter(Transaction.deleted_at.is_(None))
+        rows += [(name, t) for t in query.order_by(model.id).limit(limit + 1 - len(rows))]
+        if len(rows) > limit:
+            break
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    cursor = (rows[-1][0], rows[-1][1].id) if has_more else (SNAPSHOT_TABLES[0], 0)
+    return [t for _, t in rows], cursor, has_more
+
+def changes_since(db: Session, user: User, since: int, limit: int, after: int = 0, table: str = "archive") -> dict:
+    """
+    Transactions changed after `since`, oldest change first, at most `limit` per call.
+    since=0 (or a cursor below purged_seq, flagged as reset) starts a snapshot of live rows,
+    paged by (table, id): each page returns `table` and `after` (where the last row came
+    from) and `seq`, the change sequence when the snapshot started, and the client asks
+    again with all three. Rows changed while it pages are picked up by the incremental
+    pages that follow from that `seq`. Incremental pages include deletes and return the
+    start cursor ("archive", 0); has_more means ask again.
+    """
+    reset = 0 < since < user.purged_seq
+    if since == 0 or reset or after:
+        if since == 0 or reset:
+            since, table, after = user.change_seq, SNAPSHOT_TABLES[0], 0  # the snapshot starts now
+        rows, (table, after), has_more = _snapshot_page(db, user, table, after, limit)
+        return {
+            "reset": reset,
+            "rows": rows,
+            "deleted": [],
+            "seq": since,
+            "table": table,
+            "after": after,
+            "has_more": has_more
+        }
+
+    changed = []
+    # Archival moves rows without changing them, but a row may be archived before a client saw it
+    for model in ([ArchivedTransaction, Transaction] if user.archived_through else [Transaction]):
+        changed += db.query(model).filter(
+            and_(
+                model.username == user.username,
+                model.change_seq > since
+            )
+        ).order_by(model.change_seq).limit(limit + 1).all()
+    changed.sort(key=lambda t: t.change_seq)
+    has_more = len(changed) > limit
+    changed = changed[:limit]
+
+    return {
+        "reset": False,
+        "rows": [t for t in changed if getattr(t, "deleted_at", None) is None],
+        "deleted": [t for t in changed if getattr(t, "deleted_at", None) is not None],
+        "seq": changed[-1].change_seq if has_more else max(since, user.change_seq),
+        "table": SNAPSHOT_TABLES[0],
+        "after": 0,
+        "has_more": has_more
+    }
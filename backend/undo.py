@@ -0,0 +1,83 @@
+"""
+Undo history: bounded, persisted soft-delete journal
+Deleted transactions are tombstoned (deleted_at) instead of removed, so undo
+works across workers and restarts. Run this file to purge expired tombstones.
+Hard deletes raise the user's sync purged_seq so stale delta-sync clients resync.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+import sys
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from models import Transaction
+from sync import record_purge
+from config import UNDO_DEPTH, UNDO_TTL_MINUTES
+
+def _undo_cutoff() -> datetime:
+    """Oldest deleted_at that is still undoable"""
+    return datetime.now() - timedelta(minutes=UNDO_TTL_MINUTES)
+
+def tombstone_transaction(db: Session, t: Transaction):
+    """Soft-delete a transaction and trim the user's history to UNDO_DEPTH"""
+    t.deleted_at = datetime.now()
+    db.flush()
+
+    # Tombstones beyond the configured depth can never be undone. The one just written is
+    # always kept (even with UNDO_DEPTH=0), so callers can still read it and sync sees the delete
+    stale = db.query(Transaction.id, Transaction.change_seq).filter(
+        and_(
+            Transaction.username == t.username,
+            Transaction.deleted_at.isnot(None)
+        )
+    ).order_by(Transaction.deleted_at.desc(), Transaction.id.desc()).offset(max(UNDO_DEPTH, 1)).all()
+
+    if stale:
+        record_purge(db, [(t.username, row.change_seq) for row in stale])
+        db.query(Transaction).filter(Transaction.id.in_([row.id for row in stale])).delete(synchronize_session=False)
+
+def restore_last_deleted(db: Session, username: str) -> Optional[Transaction]:
+    """Clear the newest undoable tombstone (same id is kept); None if nothing to undo"""
+    t = db.query(Transaction).filter(
+        and_(
+            Transaction.username == username,
+            Transaction.deleted_at.isnot(None),
+            Transaction.deleted_at >= _undo_cutoff()
+        )
+    ).order_by(Transaction.deleted_at.desc(), Transaction.id.desc()).with_for_update().first()
+
+    if not t:
+        return None
+
+    t.deleted_at = None
+    db.flush()
+    return t
+
+def purge_expired_tombstones(db: Session) -> int:
+    """Permanently remove tombstones older than UNDO_TTL_MINUTES for all users"""
+    expired = db.query(Transaction).filter(
+        and_(
+            Transaction.deleted_at.isnot(None),
+            Transaction.deleted_at < _undo_cutoff()
+        )
+    )
+    record_purge(db, expired.with_entities(Transaction.username, func.max(Transaction.change_seq)).group_by(
+        Transaction.username
+    ).all())
+    count = expired.delete(synchronize_session=False)
+    db.commit()
+    return count
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        purged = purge_expired_tombstones(db)
+        print(f"✅ Purged {purged} expired deleted transaction(s)")
+    except Exception as e:
+        print(f"❌ Error purging deleted transactions: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
@@ -34,6 +34,17 @@ export default function AddTransaction() {
     "Other",
   ];
 
+  // The server rejects an identical transaction on the same date; let the user save it anyway
+  const postTransaction = async (payload) => {
+    try {
+      return await axiosInstance.post("/transactions", payload);
+    } catch (error) {
+      if (error.response?.status !== 409) throw error;
+      if (!window.confirm(`${error.response.data.detail}. Save it anyway?`)) return null;
+      return await axiosInstance.post("/transactions", { ...payload, allow_duplicate: true });
+    }
+  };
+
   const handleAddExpense = async (e) => {
     e.preventDefault();
     if (parseFloat(expenseData.amount) <= 0) {
@@ -47,14 +58,14 @@ export default function AddTransaction() {
 
     setLoading(true);
     try {
-      const response = await axiosInstance.post("/transactions", {
+      const response = await postTransaction({
         date: expenseData.date,
         category: expenseData.category,
         amount: parseFloat(expenseData.amount),
         description: expenseData.description.trim(),
         kind: "expense",
       });
-      if (response.status === 200) {
+      if (response?.status === 200) {
         toast.success("Expense added successfully!!");
         setExpenseData({
           date: new Date().toISOString().split("T")[0],
@@ -83,14 +94,14 @@ export default function AddTransaction() {
 
     setLoading(true);
     try {
-      const response = await axiosInstance.post("/transactions", {
+      const response = await postTransaction({
         date: incomeData.date,
         category: incomeData.category.trim(),
         amount: parseFloat(incomeData.amount),
         description: incomeData.description.trim() || "",
         kind: "income",
       });
-      if (response.status === 200) {
+      if (response?.status === 200) {
         toast.success("Income added successfully!!");
         setIncomeData({
           date: new Date().toISOString().split("T")[0],
@@ -16,6 +16,38 @@ export default function Dashboard({ user }) {
     fetchDashboardData();
   }, []);
 
+  // Live updates: apply server-pushed deltas instead of refetching the dashboard
+  useEffect(() => {
+    const source = new EventSource("/api/stream", { withCredentials: true });
+
+    const applyDelta = (event) => {
+      const { transaction, totals, top5_expenses } = JSON.parse(event.data);
+      setDashboardData((prev) => {
+        if (!prev) return prev;
+        let recent = prev.recent_transactions.filter((t) => t.id !== transaction.id);
+        if (event.type !== "transaction.deleted" && transaction.date) {
+          recent = [transaction, ...recent]
+            .sort((a, b) => b.date.localeCompare(a.date))
+            .slice(0, 10);
+        }
+        return { ...prev, ...totals, top5_expenses, recent_transactions: recent };
+      });
+    };
+
+    ["transaction.created", "transaction.updated", "transaction.deleted", "transaction.restored"].forEach(
+      (type) => source.addEventListener(type, applyDelta)
+    );
+    // Bulk changes carry no rows; reload the dashboard
+    ["transactions.materialized", "transactions.imported"].forEach((type) =>
+      source.addEventListener(type, fetchDashboardData)
+    );
+    source.addEventListener("budget.alert", (event) => {
+      toast(JSON.parse(event.data).message, { icon: "🔔" });
+    });
+
+    return () => source.close();
+  }, []);
+
   const fetchDashboardData = async () => {
     try {
       const response = await axiosInstance.get("/dashboard");
@@ -32,6 +32,47 @@ export default function ManageTransactions() {
     fetchCategories();
   }, [filters]);
 
+  // Same filters as GET /transactions, so a single changed row can be placed without refetching
+  const matchesFilters = (tx) =>
+    (filters.kind === "All" || tx.kind === filters.kind.toLowerCase()) &&
+    (filters.category === "All" ||
+      tx.category.toLowerCase() === filters.category.toLowerCase()) &&
+    (!filters.start_date || tx.date >= filters.start_date) &&
+    (!filters.end_date || tx.date <= filters.end_date) &&
+    (!filters.search ||
+      [tx.description, tx.category, tx.kind].some((field) =>
+        (field || "").toLowerCase().includes(filters.search.toLowerCase())
+      ));
+
+  // Apply one changed transaction to the list (idempotent, so the SSE echo of our own change is harmless)
+  const applyChange = (tx, deleted = false) => {
+    setTransactions((prev) => {
+      const rest = prev.filter((t) => t.id !== tx.id);
+      if (deleted || !matchesFilters(tx)) return rest;
+      return [tx, ...rest].sort((a, b) => b.date.localeCompare(a.date));
+    });
+  };
+
+  // Live updates from other tabs and devices
+  useEffect(() => {
+    const source = new EventSource("/api/stream", { withCredentials: true });
+    const onChange = (event) =>
+      applyChange(
+        JSON.parse(event.data).transaction,
+        event.type === "transaction.deleted"
+      );
+
+    ["transaction.created", "transaction.updated", "transaction.deleted", "transaction.restored"].forEach(
+      (type) => source.addEventListener(type, onChange)
+    );
+    // Bulk changes carry no rows; reload the list
+    ["transactions.materialized", "transactions.imported"].forEach((type) =>
+      source.addEventListener(type, fetchTransactions)
+    );
+
+    return () => source.close();
+  }, [filters]);
+
   const fetchTransactions = async () => {
     setLoading(true);
     try {
@@ -56,11 +97,10 @@ export default function ManageTransactions() {
 
   const fetchCategories = async () => {
     try {
-      const response = await axiosInstance.get("/transactions");
+      const response = await axiosInstance.get("/categories");
       if (response.status === 200) {
-        const allTx = response.data.transactions || [];
-        const uniqueCategories = [...new Set(allTx.map((t) => t.category))];
-        setCategories(uniqueCategories.sort());
+        const names = (response.data.categories || []).map((c) => c.name);
+        setCategories(names.sort());
       }
     } catch (error) {
       console.error(error);
@@ -75,7 +115,7 @@ export default function ManageTransactions() {
       const response = await axiosInstance.delete(`/transactions/${id}`);
       if (response.status === 200) {
         toast.success("Transaction deleted! You can undo from above.");
-        fetchTransactions();
+        applyChange({ id }, true);
       }
     } catch (error) {
       toast.error(
@@ -89,7 +129,7 @@ export default function ManageTransactions() {
       const response = await axiosInstance.post("/transactions/undo");
       if (response.status === 200) {
         toast.success("Last deleted transaction restored!");
-        fetchTransactions();
+        applyChange(response.data);
       }
     } catch (error) {
       toast.error(error.response?.data?.detail || "No transaction to undo");
@@ -129,7 +169,7 @@ export default function ManageTransactions() {
         toast.success("Transaction updated!!");
         setEditingId(null);
         setEditData(null);
-        fetchTransactions();
+        applyChange(response.data);
       }
     } catch (error) {
       toast.error(
@@ -315,16 +355,21 @@ export default function ManageTransactions() {
                     </div>
                   </div>
                   <div className="flex gap-2">
+                    {/* Archived (closed-year) transactions are read-only */}
                     <button
                       onClick={() => handleEdit(tx)}
-                      className="px-4 py-2 bg-blue-600 hover:bg-blue-700 rounded-lg"
+                      disabled={tx.archived}
+                      title={tx.archived ? "Archived transactions are read-only" : undefined}
+                      className="px-4 py-2 bg-blue-600 hover:bg-blue-700 rounded-lg disabled:opacity-50 disabled:cursor-not-allowed"
                     >
                       <FontAwesomeIcon icon={faPenToSquare} />
                       &nbsp;Edit
                     </button>
                     <button
                       onClick={() => handleDelete(tx.id)}
-                      className="px-4 py-2 bg-red-600 hover:bg-red-700 rounded-lg"
+                      disabled={tx.archived}
+                      title={tx.archived ? "Archived transactions are read-only" : undefined}
+                      className="px-4 py-2 bg-red-600 hover:bg-red-700 rounded-lg disabled:opacity-50 disabled:cursor-not-allowed"
                     >
                       <FontAwesomeIcon icon={faTrash} />
                       &nbsp;Delete